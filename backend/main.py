@@ -1,22 +1,42 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Request, Response, Header
+from fastapi.responses import StreamingResponse, PlainTextResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
-import joblib
 import os
-import keras
+import json
 import datetime
 import pytz
 import time
 import threading
-import geopandas as gpd
-from shapely.geometry import Point
-
-from scripts.kriging import load_tokyo_special_wards, perform_all_kriging
-from scripts.live_fetch import fetch_all_data
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from scripts.kriging import perform_all_kriging
+from scripts.regions import DEFAULT_REGION, load_regions
+from scripts.stations import station_status
+from scripts.history import (
+    MAX_HISTORY_DAYS, MAX_HISTORY_SNAPSHOTS, record_snapshot, apply_retention, iter_history, parse_timestamp,
+)
+from scripts.refresh_worker import RefreshWorkerPool, run_refresh, read_snapshot_file
+from scripts.model_registry import (
+    LEGACY_VERSION, list_versions, load_version, load_active_bundle, validate_bundle, set_active_version,
+)
+from scripts.profiling import PROFILE_MODES, new_profile_id, list_profiles, profile_path
+from scripts.skill import update_skill, get_skill, format_skill_metrics
+from scripts.push import STREAM_MODES, publish_snapshot, get_snapshot, stream_events
+from scripts.tiles import set_tile_field, get_tile, color_scale
+from scripts.contours import set_contours, get_contours
+from scripts.frames import set_frames, get_frames
+from scripts.scenarios import PREDICTION_COLUMNS, PredictionBatcher, build_scenario_matrix
 
 
+# ✅ Worker processes for the fetch/predict/krige pipeline (at most one per region is busy).
+# Defaults to one per region so regions refresh in parallel; each worker holds its own model copy.
+REFRESH_WORKERS = int(os.environ.get("REFRESH_WORKERS", "0"))
 
-LIVE_DATA_PATH = "data/live_no2_weather_data.csv"
+# ✅ Admin endpoints (profiling) are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
 
 app = FastAPI()
 
@@ -29,104 +49,496 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ✅ Load static data
-print("📡 Loading Tokyo boundary data...")
-tokyo_gdf = load_tokyo_special_wards()
+# ✅ Load static data: boundary, grid mask & transformer per region
+regions = load_regions()
 
-# ✅ Load ML model & scaler with error handling
-try:
-    print("📡 Loading ML model and scaler...")
-    scaler = joblib.load("data/scaler.pkl")
-    model = keras.models.load_model("models/no2_forecast_model.keras")
-    print("✅ ML Model and Scaler Loaded.")
-except Exception as e:
-    print(f"❌ Error loading ML model or scaler: {e}")
-    scaler = None
-    model = None
+# ✅ Active model bundle from the registry (scenarios and in-process refreshes).
+# Swapped by reassignment, so readers take one local reference and never see a mix.
+active_bundle = load_active_bundle()
+previous_bundle = None  # ✅ Kept loaded for an instant rollback
+model_swap_lock = threading.Lock()
+model_staging = {"version": None, "status": "idle", "detail": None}
 
-# ✅ Store latest predictions globally
-latest_predictions = {}
+# ✅ Store latest predictions globally, per region
+latest_predictions = {region_id: {} for region_id in regions}
 
+# ✅ Latest station state (UTM geometry + unscaled model inputs) for what-if scenarios
+latest_station_state = {region_id: None for region_id in regions}
 
-def run_live_prediction():
-    """Fetch live data, run model, update global predictions."""
-    global latest_predictions
+# ✅ Coalesces concurrent scenario requests into one predict call
+scenario_batcher = PredictionBatcher()
 
-    print("📡 Fetching latest NO₂ & weather data...")
-    fetch_all_data()  # ✅ Fetch new live data
+# ✅ Kriging is ~0.1 s per scenario, so only small requests may ask for it
+MAX_SCENARIOS = 10000
+MAX_KRIGED_SCENARIOS = 10
 
-    if not os.path.exists(LIVE_DATA_PATH):
-        print("❌ Live data file not found.")
-        return
 
-    # ✅ Load latest data
-    live_df = pd.read_csv(LIVE_DATA_PATH)
+def run_live_prediction(region_id=DEFAULT_REGION, profile=None):
+    """Fetch live data, run model, update global predictions for one region.
 
-    # ✅ Rename columns to match training data
-    rename_map = {
-        'no2lag_1': 'NO2_lag_1',
-        'no2lag_2': 'NO2_lag_2',
-        'no2lag_3': 'NO2_lag_3',
-        'no2lag_4': 'NO2_lag_4',
-        'measurement_value': 'NO2_t'
-    }
-    live_df.rename(columns=rename_map, inplace=True)
+    Returns False if the region is already refreshing.
+    """
+    if refresh_workers is not None:
+        return refresh_workers.submit(region_id, profile)  # ✅ Result arrives via `apply_refresh_result`
 
-    # ✅ Convert to GeoDataFrame
-    live_df["geometry"] = live_df.apply(lambda row: Point(row["longitude"], row["latitude"]), axis=1)
-    sensor_gdf = gpd.GeoDataFrame(live_df, geometry="geometry", crs="EPSG:4326")  # ✅ Set CRS to WGS84
+    region = regions[region_id]
 
-    # ✅ Transform to UTM
-    sensor_gdf = sensor_gdf.to_crs("EPSG:32654")  # ✅ Convert to Tokyo's UTM Zone
+    # ✅ Skip if this region is already refreshing; other regions are unaffected
+    if not region["lock"].acquire(blocking=False):
+        print(f"⏳ {region['name']} is already refreshing.")
+        return False
 
-    # ✅ Check if ML model & scaler are available
-    if not scaler or not model:
-        print("❌ Error: ML model or scaler is not loaded. Cannot predict.")
-        return
+    run_locked_refresh(region, profile)
+    return True
+
+
+def run_locked_refresh(region, profile=None):
+    """In-process refresh of a region whose lock the caller already holds; releases it."""
+    try:
+        result = run_refresh(region, active_bundle, profile)
+        if result:
+            apply_refresh_result(region, result)
+    finally:
+        region["lock"].release()
 
-    # ✅ Check feature compatibility
-    expected_features = scaler.feature_names_in_.tolist()
-    missing_features = set(expected_features) - set(sensor_gdf.columns)
 
-    if missing_features:
-        print(f"🚨 ERROR: Missing features in live data: {missing_features}")
+def run_all_live_predictions():
+    """Refresh every region in parallel."""
+    if refresh_workers is not None:
+        for region_id in regions:
+            refresh_workers.submit(region_id)
         return
 
-    # ✅ Process data for model
-    live_processed = sensor_gdf[expected_features].copy()  # 🔥 FIX: Explicitly copy data
-    live_processed.fillna(live_processed.mean(), inplace=True)
+    with ThreadPoolExecutor(max_workers=max(1, len(regions))) as executor:
+        list(executor.map(run_live_prediction, regions))
+
+
+def apply_refresh_result(region, result):
+    """Publish a finished refresh: only cheap bookkeeping runs in the API process."""
+    sensor_gdf, interpolations = result["sensor_gdf"], result["interpolations"]
+    latest_station_state[region["id"]] = (sensor_gdf, result["live_processed"])
+
+    # ✅ Score the forecasts made 1–4 hours ago against the values that just arrived
+    update_skill(region["id"], result["snapshot_time"], sensor_gdf)
+
+    latest_predictions[region["id"]] = interpolations  # ✅ Swap in one assignment
+
+    # ✅ Serialize once and push to connected clients
+    version = publish_snapshot(region["id"], interpolations)
+
+    # ✅ Tiles and contour bands of the new version; older ones are dropped
+    set_tile_field(region, version, result["grids"])
+    set_contours(region["id"], version, result["contours"])
+    set_frames(region["id"], version, result["snapshot_time"], result["frames"])
+
+    # ✅ Keep a copy in the history store instead of losing it on the next refresh
+    record_snapshot(region["id"], result["snapshot_time"], sensor_gdf, interpolations)
+    apply_retention(region["id"])
+    print(f"✅ Snapshot {version} published for {region['name']}.")
+
+
+def _on_worker_result(region_id, snapshot_path):
+    apply_refresh_result(regions[region_id], read_snapshot_file(snapshot_path))
+
+
+# ✅ Refreshes run in a worker process unless REFRESH_IN_PROCESS=1
+refresh_workers = None
+if os.environ.get("REFRESH_IN_PROCESS") != "1":
+    refresh_workers = RefreshWorkerPool(_on_worker_result, n_workers=REFRESH_WORKERS or max(1, len(regions)))
+
 
-    # ✅ Scale data
-    live_scaled = pd.DataFrame(scaler.transform(live_processed), columns=expected_features)
+def get_region_or_404(region_id):
+    if region_id not in regions:
+        raise HTTPException(status_code=404, detail=f"Unknown region '{region_id}'")
+    return regions[region_id]
 
-    # ✅ Reshape for LSTM model
-    X_live = live_scaled.values.reshape((live_scaled.shape[0], 1, live_scaled.shape[1]))
 
-    # ✅ Predict next NO₂ values
-    predictions = model.predict(X_live)
+@app.get("/health")
+def get_health():
+    """Liveness plus the state of the refresh worker processes."""
+    return {
+        "status": "ok",
+        "refresh": "in-process" if refresh_workers is None else refresh_workers.status(),
+        "model_version": active_bundle["version"],
+        "model_loaded": active_bundle["model"] is not None,
+        "regions_ready": {region_id: bool(latest_predictions[region_id]) for region_id in regions},
+    }
+
 
-    # ✅ Store results
-    sensor_gdf[['NO2_T+1', 'NO2_T+2', 'NO2_T+3', 'NO2_T+4']] = predictions
-    sensor_gdf.to_csv(LIVE_DATA_PATH, index=False)
-    print("✅ Predictions saved to live_predictions.csv")
+@app.get("/pollution/regions")
+def get_regions():
+    """List the regions served by this deployment."""
+    return {
+        "default": DEFAULT_REGION,
+        "regions": [
+            {"id": region_id, "name": region["name"], "ready": bool(latest_predictions[region_id])}
+            for region_id, region in regions.items()
+        ],
+    }
 
-    # ✅ Perform Kriging interpolation
-    latest_predictions = perform_all_kriging(sensor_gdf, tokyo_gdf)  # 🔥 FIX: Use `sensor_gdf`
-    print("✅ Live Kriging Interpolation Complete.")
+
+@app.get("/pollution/stations")
+def get_stations(region: str = DEFAULT_REGION):
+    """Station registry: every known NO₂ sensor with its freshness, failure count and backoff."""
+    get_region_or_404(region)
+    return station_status(region)
 
 
 @app.get("/pollution/live")
-def get_live_pollution():
+def get_live_pollution(request: Request):
     """Serve the latest Kriging interpolated NO₂ data in lat/lon format."""
-    if not latest_predictions:
+    return get_live_pollution_for_region(DEFAULT_REGION, request)
+
+
+@app.get("/pollution/live/{region_id}")
+def get_live_pollution_for_region(region_id: str, request: Request):
+    """Serve the latest Kriging interpolated NO₂ data for one region."""
+    get_region_or_404(region_id)
+    snapshot = get_snapshot(region_id)
+    if not snapshot:
+        return {"status": "processing", "message": "Data is not ready yet. Try again later."}
+
+    # ✅ Pre-serialized payload; unchanged snapshots cost clients a 304
+    etag = f'"{region_id}-{snapshot["version"]}"'
+    headers = {"ETag": etag, "X-Snapshot-Version": snapshot["version"]}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot["payload"], media_type="application/json", headers=headers)
+
+
+@app.get("/pollution/tiles/legend")
+def get_tile_legend():
+    """Fixed colour scale used by the raster tiles."""
+    return color_scale()
+
+
+@app.get("/pollution/tiles/{horizon}/{z}/{x}/{y}.png")
+def get_pollution_tile(horizon: str, z: int, x: int, y: int, request: Request, region: str = DEFAULT_REGION):
+    """XYZ raster tile of the interpolated NO₂ field for one horizon (e.g. `NO2_T+1`)."""
+    get_region_or_404(region)
+    if not 0 <= z <= 22 or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=400, detail="Tile coordinates out of range")
+
+    try:
+        png, version = get_tile(region, horizon, z, x, y)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown horizon '{horizon}'")
+    if png is None:
+        raise HTTPException(status_code=503, detail="Data is not ready yet. Try again later.")
+
+    # ✅ Tiles change only when the snapshot version does
+    etag = f'"{region}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=png, media_type="image/png", headers=headers)
+
+
+@app.get("/pollution/contours/{horizon}")
+def get_pollution_contours(horizon: str, request: Request, region: str = DEFAULT_REGION):
+    """Banded NO₂ concentration polygons for one horizon as GeoJSON."""
+    get_region_or_404(region)
+    try:
+        geojson, version = get_contours(region, horizon)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown horizon '{horizon}'")
+    if geojson is None:
+        return {"status": "processing", "message": "Data is not ready yet. Try again later."}
+
+    etag = f'"{region}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=geojson, media_type="application/geo+json", headers=headers)
+
+
+@app.get("/pollution/frames")
+def get_animation_frames(region: str = DEFAULT_REGION):
+    """Frame count, times and the cell coordinates shared by every animation frame."""
+    get_region_or_404(region)
+    frames = get_frames(region)
+    if frames is None:
+        return {"status": "processing", "message": "Data is not ready yet. Try again later."}
+    return Response(content=frames["meta"], media_type="application/json", headers={"X-Snapshot-Version": frames["version"]})
+
+
+@app.get("/pollution/frames/{index}")
+def get_animation_frame(index: int, region: str = DEFAULT_REGION):
+    """Values of one interpolated animation frame, aligned with the cells from `/pollution/frames`."""
+    get_region_or_404(region)
+    frames = get_frames(region)
+    if frames is None:
         return {"status": "processing", "message": "Data is not ready yet. Try again later."}
-    return latest_predictions
+    if not 0 <= index < len(frames["frames"]):
+        raise HTTPException(status_code=404, detail=f"Frame index must be between 0 and {len(frames['frames']) - 1}")
+    return Response(content=frames["frames"][index], media_type="application/json", headers={"X-Snapshot-Version": frames["version"]})
+
+
+@app.get("/pollution/stream")
+def stream_live_pollution(request: Request, region: str = DEFAULT_REGION, payload: str = "announce"):
+    """Server-Sent Events announcing each new snapshot (`payload` = announce, full or delta)."""
+    get_region_or_404(region)
+    if payload not in STREAM_MODES:
+        raise HTTPException(status_code=400, detail=f"`payload` must be one of {', '.join(STREAM_MODES)}")
+
+    return StreamingResponse(
+        stream_events(region, payload, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/pollution/history")
+def get_pollution_history(
+    start: str = Query(..., alias="from"),
+    end: str | None = Query(None, alias="to"),
+    region: str = DEFAULT_REGION,
+    grid: bool = True,
+    limit: int = Query(MAX_HISTORY_SNAPSHOTS, ge=1, le=MAX_HISTORY_SNAPSHOTS),
+):
+    """Stream up to `limit` stored snapshots between `from` and `to` (ISO timestamps, UTC) as NDJSON.
+
+    The range is capped at MAX_HISTORY_DAYS; `to` defaults to `from` plus that span.
+    """
+    get_region_or_404(region)
+    try:
+        start_dt = parse_timestamp(start)
+        end_dt = parse_timestamp(end) if end else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="`from` and `to` must be ISO-8601 timestamps")
+
+    max_end = start_dt + datetime.timedelta(days=MAX_HISTORY_DAYS)
+    if end_dt is None:
+        end_dt = max_end
+    elif end_dt > max_end:
+        raise HTTPException(status_code=400, detail=f"`from` to `to` may span at most {MAX_HISTORY_DAYS} days")
+
+    history = iter_history(region, start_dt, end_dt, include_grid=grid, limit=limit)
+    return StreamingResponse(history, media_type="application/x-ndjson")
+
+
+@app.get("/pollution/skill")
+def get_forecast_skill(region: str = DEFAULT_REGION):
+    """Running MAE / RMSE / bias of past forecasts, per horizon and station."""
+    get_region_or_404(region)
+    return get_skill(region)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Forecast skill for every region in Prometheus text format."""
+    return format_skill_metrics({region_id: get_skill(region_id) for region_id in regions})
+
+
+class Scenario(BaseModel):
+    name: str | None = None
+    overrides: dict[str, float] = {}
+    adjustments: dict[str, float] = {}
+
+
+class ScenarioRequest(BaseModel):
+    scenarios: list[Scenario]
+    region: str = DEFAULT_REGION
+    krige: bool = False
+
+
+@app.post("/pollution/scenarios")
+async def run_pollution_scenarios(request: ScenarioRequest):
+    """What-if forecasts: override `future_*` weather inputs for many scenarios in one batched predict."""
+    region = get_region_or_404(request.region)
+    state = latest_station_state[request.region]
+    bundle = active_bundle  # ✅ One model version for the whole request, even mid-swap
+    scaler = bundle["scaler"]
+    if state is None or not scaler:
+        raise HTTPException(status_code=503, detail="Data is not ready yet. Try again later.")
+    if not 0 < len(request.scenarios) <= MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {MAX_SCENARIOS} scenarios")
+    if request.krige and len(request.scenarios) > MAX_KRIGED_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"Kriging is limited to {MAX_KRIGED_SCENARIOS} scenarios per request")
+
+    sensor_gdf, live_processed = state
+    # ✅ The live inputs were built with the features of the model that ran the last refresh
+    if list(live_processed.columns) != scaler.feature_names_in_.tolist():
+        raise HTTPException(
+            status_code=409, detail=f"Live inputs do not match model {bundle['version']} yet. Try again after the next refresh."
+        )
+    scenarios = [scenario.model_dump() for scenario in request.scenarios]
+
+    # ✅ Build & scale all scenarios × stations off the event loop
+    def prepare():
+        features = build_scenario_matrix(live_processed, scenarios)
+        scaled = scaler.transform(features[scaler.feature_names_in_.tolist()])
+        return scaled.reshape((scaled.shape[0], 1, scaled.shape[1]))
+
+    try:
+        X = await run_in_threadpool(prepare)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        predictions = await scenario_batcher.predict(X, bundle["model"])
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    # ✅ Assemble & encode off the event loop, one scenario at a time so the GIL is released in between
+    def assemble():
+        n_stations = len(sensor_gdf)
+        per_scenario = np.asarray(predictions, dtype=float).reshape(len(scenarios), n_stations, len(PREDICTION_COLUMNS))
+
+        encoded = []
+        for scenario, scenario_predictions in zip(scenarios, per_scenario):
+            result = {"name": scenario["name"], "predictions": scenario_predictions.tolist()}
+            if request.krige:
+                scenario_gdf = sensor_gdf.copy()
+                scenario_gdf[PREDICTION_COLUMNS] = scenario_predictions
+                result["kriging"] = perform_all_kriging(scenario_gdf, region["boundary"], region["grid"], region["crs"])
+            encoded.append(json.dumps(result))
+
+        header = json.dumps({
+            "region": request.region,
+            "model_version": bundle["version"],
+            "station_ids": sensor_gdf["station_id"].tolist(),
+            "columns": PREDICTION_COLUMNS,  # ✅ Each scenario's `predictions` is one row per station in this order
+        })
+        return header[:-1] + ', "scenarios": [' + ", ".join(encoded) + "]}"
+
+    return Response(await run_in_threadpool(assemble), media_type="application/json")
+
+
+def require_admin(x_admin_token: str | None):
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@app.post("/admin/profile")
+def profile_refresh(
+    background_tasks: BackgroundTasks,
+    region: str = DEFAULT_REGION,
+    mode: str = "sampling",
+    memory: bool = False,
+    synthetic: bool = False,
+    x_admin_token: str | None = Header(None),
+):
+    """Run a refresh under the profiler; `synthetic` reuses the last fetched inputs instead of the APIs.
+
+    Only the profile artifacts are kept; the refresh result is not published.
+    """
+    require_admin(x_admin_token)
+    get_region_or_404(region)
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"`mode` must be one of {', '.join(PROFILE_MODES)}")
+
+    profile = {"id": new_profile_id(region, mode), "mode": mode, "memory": memory, "synthetic": synthetic}
+
+    if refresh_workers is not None:
+        if not refresh_workers.submit(region, profile):
+            raise HTTPException(status_code=409, detail=f"'{region}' is already refreshing")
+    else:
+        # ✅ Take the region lock now, so a busy region gets the same 409 as in worker mode
+        region_state = regions[region]
+        if not region_state["lock"].acquire(blocking=False):
+            raise HTTPException(status_code=409, detail=f"'{region}' is already refreshing")
+        background_tasks.add_task(run_locked_refresh, region_state, profile)
+
+    return {"message": "Profiled refresh queued.", "profile_id": profile["id"]}
+
+
+@app.get("/admin/profiles")
+def get_profiles(x_admin_token: str | None = Header(None)):
+    """List stored profile artifacts (.collapsed, .prof, .txt, .memory.txt)."""
+    require_admin(x_admin_token)
+    return {"profiles": list_profiles()}
+
+
+@app.get("/admin/profiles/{name}")
+def download_profile(name: str, x_admin_token: str | None = Header(None)):
+    """Download one profile artifact."""
+    require_admin(x_admin_token)
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Unknown profile artifact '{name}'")
+    return FileResponse(path, filename=name)
+
+
+def stage_model(version):
+    """Load and validate `version` off the request path, then swap it in."""
+    global active_bundle, previous_bundle
+    try:
+        candidate = load_version(version)
+        report = validate_bundle(candidate, active_bundle)
+    except Exception as e:
+        model_staging.update(status="failed", detail=str(e))
+        print(f"❌ Model {version} rejected: {e}")
+        return
+
+    # ✅ Persist first so worker processes pick it up on their next refresh
+    set_active_version(version)
+    previous_bundle, active_bundle = active_bundle, candidate
+    model_staging.update(status="active", detail=report)
+    print(f"✅ Model {version} is now active (replaced {previous_bundle['version']}).")
+
+
+@app.get("/admin/models")
+def get_models(x_admin_token: str | None = Header(None)):
+    """Registered model versions, the active one and the last staging attempt."""
+    require_admin(x_admin_token)
+    return {
+        "active": active_bundle["version"],
+        "previous": previous_bundle["version"] if previous_bundle else None,
+        "staging": model_staging,
+        "versions": list_versions(),
+    }
+
+
+@app.post("/admin/models/{version}/activate")
+def activate_model(version: str, x_admin_token: str | None = Header(None)):
+    """Stage a registered version: load, verify and validate it in the background, then swap."""
+    require_admin(x_admin_token)
+    # ✅ Only registered versions; the name is never used as a path otherwise
+    if version != LEGACY_VERSION and version not in {m["version"] for m in list_versions()}:
+        raise HTTPException(status_code=404, detail=f"Unknown model version '{version}'")
+    if version == active_bundle["version"]:
+        return {"message": f"Model {version} is already active."}
+    if not model_swap_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail=f"Model {model_staging['version']} is still being staged")
+
+    def run():
+        try:
+            stage_model(version)
+        finally:
+            model_swap_lock.release()
+
+    model_staging.update(version=version, status="validating", detail=None)
+    threading.Thread(target=run, daemon=True).start()
+    return {"message": f"Validating model {version}; see /admin/models for the result."}
+
+
+@app.post("/admin/models/rollback")
+def rollback_model(x_admin_token: str | None = Header(None)):
+    """Swap back to the previously active model, which is still loaded."""
+    global active_bundle, previous_bundle
+    require_admin(x_admin_token)
+    if not model_swap_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail=f"Model {model_staging['version']} is still being staged")
+    try:
+        if previous_bundle is None:
+            raise HTTPException(status_code=409, detail="No previous model to roll back to")
+        set_active_version(previous_bundle["version"])
+        previous_bundle, active_bundle = active_bundle, previous_bundle
+        model_staging.update(version=active_bundle["version"], status="rolled back", detail=None)
+    finally:
+        model_swap_lock.release()
+    return {"message": f"Rolled back to model {active_bundle['version']}.", "previous": previous_bundle["version"]}
 
 
 @app.post("/pollution/update")
-def update_live_pollution(background_tasks: BackgroundTasks):
-    """Manually trigger live data fetch & prediction."""
-    background_tasks.add_task(run_live_prediction)
+def update_live_pollution(background_tasks: BackgroundTasks, region: str | None = None):
+    """Manually trigger live data fetch & prediction (one region, or all if omitted)."""
+    if region is None:
+        background_tasks.add_task(run_all_live_predictions)
+    else:
+        get_region_or_404(region)
+        background_tasks.add_task(run_live_prediction, region)
     return {"message": "Updating live data & predictions in the background..."}
 
 @app.get("/pollution/timestamps")
@@ -159,12 +571,14 @@ def auto_update():
         time_until_update = (next_update - now).total_seconds()
         time.sleep(time_until_update)  # Wait until the next full hour
 
-        run_live_prediction()  # ✅ Fetch & predict new data
+        run_all_live_predictions()  # ✅ Fetch & predict new data for every region
 
 
 @app.on_event("startup")
 def startup_event():
     """Run live data fetch & prediction when FastAPI starts."""
     print("🚀 Running initial live data fetch and predictions...")
-    threading.Thread(target=run_live_prediction, daemon=True).start()
+    if refresh_workers is not None:
+        refresh_workers.start()
+    threading.Thread(target=run_all_live_predictions, daemon=True).start()
     threading.Thread(target=auto_update, daemon=True).start()
\ No newline at end of file
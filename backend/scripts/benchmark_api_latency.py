@@ -0,0 +1,63 @@
+import sys
+import time
+import threading
+
+import numpy as np
+import requests
+
+# Usage: python scripts/benchmark_api_latency.py [base_url]
+# Run once with REFRESH_IN_PROCESS=1 (before) and once without (after) to compare.
+BASE_URL = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8000"
+ENDPOINT = "/pollution/live"
+CLIENT_THREADS = 8
+IDLE_SECONDS = 20
+REFRESH_POLL_SECONDS = 2
+REFRESH_MAX_SECONDS = 30 * 60
+
+
+def hammer(stop_event, latencies):
+    """Request the endpoint in a loop, recording each latency in milliseconds."""
+    session = requests.Session()
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        try:
+            session.get(BASE_URL + ENDPOINT, timeout=30)
+        except requests.RequestException:
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def measure(phase, wait):
+    latencies = []
+    stop_event = threading.Event()
+    threads = [threading.Thread(target=hammer, args=(stop_event, latencies), daemon=True) for _ in range(CLIENT_THREADS)]
+    for thread in threads:
+        thread.start()
+
+    wait()
+
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+
+    values = np.array(latencies)
+    print(f"📊 {phase}: {len(values)} requests, p50={np.percentile(values, 50):.1f} ms, "
+          f"p95={np.percentile(values, 95):.1f} ms, p99={np.percentile(values, 99):.1f} ms, max={values.max():.1f} ms")
+
+
+def wait_for_refresh():
+    """Trigger a refresh and wait until a new snapshot version is served."""
+    old_version = requests.get(BASE_URL + ENDPOINT).headers.get("X-Snapshot-Version")
+    requests.post(BASE_URL + "/pollution/update")
+    deadline = time.time() + REFRESH_MAX_SECONDS
+
+    while time.time() < deadline:
+        time.sleep(REFRESH_POLL_SECONDS)
+        if requests.get(BASE_URL + ENDPOINT).headers.get("X-Snapshot-Version") != old_version:
+            return
+    print("⚠️ Refresh did not finish in time.")
+
+
+if __name__ == "__main__":
+    measure("Idle", lambda: time.sleep(IDLE_SECONDS))
+    measure("During refresh", wait_for_refresh)
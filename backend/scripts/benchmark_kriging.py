@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+# Ensure the script can find the `scripts` package from the backend directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scripts.kriging import UTM_ZONE, KRIGING_COLUMNS, load_tokyo_special_wards, perform_all_kriging, perform_local_kriging
+
+# Station counts to benchmark
+STATION_COUNTS = [25, 50, 100, 250, 500, 1000, 2000]
+
+# Global kriging gets too slow to be worth timing past this
+GLOBAL_MAX_STATIONS = 500
+
+OUTPUT_PATH = "data/kriging_benchmark.png"
+
+
+def make_synthetic_stations(tokyo_gdf, n_stations, seed=0):
+    """Scatter `n_stations` fake sensors over the Tokyo bounds with a smooth NO₂ field."""
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = tokyo_gdf.total_bounds
+    x = rng.uniform(minx, maxx, n_stations)
+    y = rng.uniform(miny, maxy, n_stations)
+
+    df = pd.DataFrame()
+    base = 0.01 + 0.005 * np.sin((x - minx) / 5000) * np.cos((y - miny) / 5000)
+    for h, column in enumerate(KRIGING_COLUMNS):
+        df[column] = base * (1 + 0.05 * h) + rng.normal(0, 0.001, n_stations)
+
+    return gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(x, y), crs=UTM_ZONE)
+
+
+def time_call(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def deviation_from_global(local, global_):
+    """Median and max |local - global| (ppm) over every horizon and grid cell."""
+    diffs = np.concatenate([
+        np.abs(np.asarray(local[column])[:, 2] - np.asarray(global_[column])[:, 2]) for column in KRIGING_COLUMNS
+    ])
+    return float(np.median(diffs)), float(np.max(diffs))
+
+
+def main():
+    tokyo_gdf = load_tokyo_special_wards()
+    results = []
+
+    for n in STATION_COUNTS:
+        sensor_gdf = make_synthetic_stations(tokyo_gdf, n)
+
+        global_time, global_result = (
+            time_call(perform_all_kriging, sensor_gdf, tokyo_gdf) if n <= GLOBAL_MAX_STATIONS else (np.nan, None)
+        )
+        local_time, local_result = time_call(perform_local_kriging, sensor_gdf, tokyo_gdf, n_jobs=1)
+        parallel_time, _ = time_call(perform_local_kriging, sensor_gdf, tokyo_gdf)
+
+        # ✅ Accuracy of the local windows against the global solve, where it was run
+        median_dev, max_dev = deviation_from_global(local_result, global_result) if global_result else (np.nan, np.nan)
+
+        print(
+            f"⏱️ N={n}: global={global_time:.2f}s, local={local_time:.2f}s, local (parallel)={parallel_time:.2f}s, "
+            f"|local - global| median={median_dev:.5f} max={max_dev:.5f} ppm"
+        )
+        results.append((n, global_time, local_time, parallel_time, median_dev, max_dev))
+
+    results = np.array(results)
+
+    fig, (ax_time, ax_dev) = plt.subplots(1, 2, figsize=(13, 5))
+    ax_time.plot(results[:, 0], results[:, 1], marker="o", label="Global kriging")
+    ax_time.plot(results[:, 0], results[:, 2], marker="o", label="Local kriging (1 core)")
+    ax_time.plot(results[:, 0], results[:, 3], marker="o", label=f"Local kriging ({os.cpu_count()} cores)")
+    ax_time.set_xscale("log")
+    ax_time.set_yscale("log")
+    ax_time.set_xlabel("Number of stations")
+    ax_time.set_ylabel("Runtime (s)")
+    ax_time.set_title("Kriging runtime vs. station count")
+    ax_time.legend()
+
+    ax_dev.plot(results[:, 0], results[:, 4], marker="o", label="Median")
+    ax_dev.plot(results[:, 0], results[:, 5], marker="o", label="Max")
+    ax_dev.set_xscale("log")
+    ax_dev.set_xlabel("Number of stations")
+    ax_dev.set_ylabel("|local - global| (ppm)")
+    ax_dev.set_title("Local kriging accuracy vs. global")
+    ax_dev.legend()
+    fig.tight_layout()
+    plt.savefig(OUTPUT_PATH, dpi=150)
+    print(f"✅ Benchmark chart saved to {OUTPUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
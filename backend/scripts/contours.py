@@ -0,0 +1,104 @@
+import json
+import threading
+
+import numpy as np
+import shapely
+from contourpy import contour_generator, FillType
+from shapely.geometry import Polygon, MultiPolygon, mapping
+
+from scripts.kriging import get_transformer
+from scripts.tiles import COLOR_VMIN, COLOR_VMAX, COLOR_LUT
+
+# ✅ Concentration bands (ppm) on the same fixed scale as the raster tiles, open-ended at the top
+BAND_LEVELS = np.linspace(COLOR_VMIN, COLOR_VMAX, 9).tolist() + [np.inf]
+SIMPLIFY_TOLERANCE = 100  # metres, well below the ~600 m Kriging grid spacing
+BOUNDARY_SIMPLIFY_TOLERANCE = 50
+COORDINATE_DECIMALS = 5  # ~1 m
+
+_boundaries = {}  # region_id -> simplified, prepared boundary used for clipping
+_contours = {}  # region_id -> {"version", "layers": {column: GeoJSON bytes}}
+_lock = threading.Lock()
+
+
+def _band_color(lower):
+    scaled = (lower - COLOR_VMIN) / (COLOR_VMAX - COLOR_VMIN)
+    r, g, b, _ = COLOR_LUT[int(np.clip(scaled * 255, 0, 255))]
+    return "#%02x%02x%02x" % (r, g, b)
+
+
+def _clip_boundary(region):
+    if region["id"] not in _boundaries:
+        boundary = region["boundary"].geometry.union_all().simplify(BOUNDARY_SIMPLIFY_TOLERANCE)
+        shapely.prepare(boundary)
+        _boundaries[region["id"]] = boundary
+    return _boundaries[region["id"]]
+
+
+def _round_coords(coords):
+    if isinstance(coords[0], (int, float)):
+        return [round(c, COORDINATE_DECIMALS) for c in coords]
+    return [_round_coords(c) for c in coords]
+
+
+def extract_bands(field, grid_x, grid_y):
+    """Marching-squares filled contours of a (len(grid_y), len(grid_x)) field, one geometry per band."""
+    generator = contour_generator(grid_x, grid_y, np.ma.masked_invalid(field), fill_type=FillType.OuterOffset)
+    finite_max = np.nanmax(field) if np.isfinite(field).any() else COLOR_VMAX
+
+    bands = []
+    for lower, upper in zip(BAND_LEVELS[:-1], BAND_LEVELS[1:]):
+        points, offsets = generator.filled(lower, min(upper, finite_max + 1))
+        polygons = []
+        for ring_points, ring_offsets in zip(points, offsets):
+            rings = [ring_points[start:end] for start, end in zip(ring_offsets[:-1], ring_offsets[1:])]
+            polygons.append(Polygon(rings[0], rings[1:]))
+        if polygons:
+            bands.append((lower, upper, shapely.make_valid(MultiPolygon(polygons))))
+    return bands
+
+
+def build_contour_layers(region, grids):
+    """GeoJSON FeatureCollection bytes per horizon: bands clipped to the region and simplified."""
+    boundary = _clip_boundary(region)
+    transformer = get_transformer(region["crs"])
+    grid_x, grid_y, _ = region["grid"]
+
+    def to_lon_lat(coords):
+        lons, lats = transformer.transform(coords[:, 0], coords[:, 1])
+        return np.column_stack([lons, lats])
+
+    layers = {}
+    for column, field in grids.items():
+        features = []
+        for lower, upper, geometry in extract_bands(field, grid_x, grid_y):
+            geometry = geometry.intersection(boundary).simplify(SIMPLIFY_TOLERANCE)
+            # ✅ Keep only the polygonal parts (clipping can leave lines and points on the edges)
+            polygons = [part for part in shapely.get_parts(geometry) if part.geom_type in ("Polygon", "MultiPolygon")]
+            if not polygons:
+                continue
+            geometry = shapely.transform(shapely.union_all(polygons), to_lon_lat)
+            geojson = mapping(geometry)
+            geojson["coordinates"] = _round_coords(geojson["coordinates"])
+            features.append({
+                "type": "Feature",
+                "properties": {"lower": lower, "upper": None if np.isinf(upper) else upper, "color": _band_color(lower)},
+                "geometry": geojson,
+            })
+
+        layers[column] = json.dumps({"type": "FeatureCollection", "features": features}, separators=(",", ":")).encode()
+    return layers
+
+
+def set_contours(region_id, version, layers):
+    """Serve the `build_contour_layers` output of a new snapshot."""
+    with _lock:
+        _contours[region_id] = {"version": version, "layers": layers}
+
+
+def get_contours(region_id, column):
+    """(GeoJSON bytes, version) for a horizon, or (None, None) before the first refresh."""
+    with _lock:
+        contours = _contours.get(region_id)
+    if contours is None:
+        return None, None
+    return contours["layers"][column], contours["version"]
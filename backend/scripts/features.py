@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+# ✅ Long-format hourly observations: one row per (station_id, hour)
+WEATHER_VARIABLES = ["temp", "wind", "wind_dir", "humidity", "pressure"]
+VALUE_COLUMNS = ["NO2"] + WEATHER_VARIABLES
+HOURLY_COLUMNS = ["station_id", "hour"] + VALUE_COLUMNS
+
+N_LAGS = 4
+N_HORIZONS = 4
+TARGET_COLUMNS = [f"NO2_target_T+{i}" for i in range(1, N_HORIZONS + 1)]
+LAG_COLUMNS = [f"NO2_lag_{i}" for i in range(1, N_LAGS + 1)]
+
+
+def index_hourly(hourly_df):
+    """Index observations by (station_id, hour). Hours are floored to UTC; duplicates are averaged."""
+    df = hourly_df.reindex(columns=HOURLY_COLUMNS).copy()
+    df["hour"] = pd.to_datetime(df["hour"], utc=True).dt.floor("h")
+    df[VALUE_COLUMNS] = df[VALUE_COLUMNS].astype(float)
+    return df.groupby(["station_id", "hour"])[VALUE_COLUMNS].mean()  # ✅ Sorted, unique index
+
+
+def lookup(indexed, stations, hours, columns=VALUE_COLUMNS):
+    """Values at each (station, hour) pair as an array; missing hours come back as NaN."""
+    keys = pd.MultiIndex.from_arrays([stations, hours], names=indexed.index.names)
+    return indexed[columns].reindex(keys).to_numpy()
+
+
+def build_features(hourly_df, require_targets=True, require_lags=True):
+    """Model rows for every observed hour: lags, past/future weather and targets by (station, hour ± i).
+
+    Column names match `live_fetch` (`*_1` is one hour away from `hour`, `*_4` four hours).
+    With `require_lags`, rows missing any NO₂ lag are dropped rather than left for imputation.
+    """
+    indexed = index_hourly(hourly_df)
+    base = indexed[indexed["NO2"].notna()]
+    stations = base.index.get_level_values("station_id")
+    hours = base.index.get_level_values("hour")
+
+    features = {
+        "station_id": stations.to_numpy(),
+        "measurement_datetime_utc": hours.strftime("%Y-%m-%d %H:%M:%S"),
+        "NO2_t": base["NO2"].to_numpy(),
+    }
+
+    # ✅ One vectorized join per offset instead of shifting across unrelated rows
+    for i in range(1, max(N_LAGS, N_HORIZONS) + 1):
+        offset = pd.Timedelta(hours=i)
+
+        if i <= N_LAGS:
+            past = lookup(indexed, stations, hours - offset)
+            features[f"NO2_lag_{i}"] = past[:, 0]
+            for j, var in enumerate(WEATHER_VARIABLES, 1):
+                features[f"past_{var}_{i}"] = past[:, j]
+
+        if i <= N_HORIZONS:
+            future = lookup(indexed, stations, hours + offset)
+            features[f"NO2_target_T+{i}"] = future[:, 0]
+            for j, var in enumerate(WEATHER_VARIABLES, 1):
+                features[f"future_{var}_{i}"] = future[:, j]
+
+    features_df = pd.DataFrame(features)
+    required = (TARGET_COLUMNS if require_targets else []) + (LAG_COLUMNS if require_lags else [])
+    return features_df.dropna(subset=required).reset_index(drop=True)
+
+
+def samples_to_hourly(samples_df):
+    """Unroll wide random-hour samples (`get_data_for_model.main`) into hourly observations.
+
+    Those samples store the oldest hour as `*_1` (t-4 … t-1), unlike the live data.
+    """
+    t = pd.to_datetime(samples_df["measurement_datetime_utc"], utc=True)
+    station_id = samples_df["station_id"].to_numpy()
+    frames = [pd.DataFrame({"station_id": station_id, "hour": t, "NO2": samples_df["measurement_value"]})]
+
+    for i in range(1, N_LAGS + 1):
+        past = {"station_id": station_id, "hour": t - pd.Timedelta(hours=N_LAGS + 1 - i)}
+        past["NO2"] = samples_df.get(f"NO2_lag_{i}", np.nan)
+        for var in WEATHER_VARIABLES:
+            past[var] = samples_df.get(f"past_{var}_{i}", np.nan)
+        frames.append(pd.DataFrame(past))
+
+    for i in range(1, N_HORIZONS + 1):
+        future = {"station_id": station_id, "hour": t + pd.Timedelta(hours=i), "NO2": np.nan}
+        for var in WEATHER_VARIABLES:
+            future[var] = samples_df.get(f"future_{var}_{i}", np.nan)
+        frames.append(pd.DataFrame(future))
+
+    return pd.concat(frames, ignore_index=True).reindex(columns=HOURLY_COLUMNS)
+
+
+def samples_to_live_order(samples_df):
+    """Wide random-hour samples with their own targets, with `NO2_lag_*` and `past_*` flipped to the live order."""
+    df = samples_df.rename(columns={"measurement_value": "NO2_t"})
+    flipped = {}
+    for i in range(1, N_LAGS + 1):
+        j = N_LAGS + 1 - i
+        flipped[f"NO2_lag_{i}"] = f"NO2_lag_{j}"
+        for var in WEATHER_VARIABLES:
+            flipped[f"past_{var}_{i}"] = f"past_{var}_{j}"
+    return df.rename(columns={k: v for k, v in flipped.items() if k in df.columns})
@@ -0,0 +1,76 @@
+import json
+import datetime
+import threading
+
+import numpy as np
+
+from scripts.kriging import KRIGING_COLUMNS, get_transformer
+
+# ✅ Animation frames between the hourly horizons, derived from the gridded field
+FRAME_STEP_MINUTES = 10
+
+_frames = {}  # region_id -> {"version", "meta": bytes, "frames": [bytes, ...]}
+_lock = threading.Lock()
+
+
+def build_frames(grids, grid, crs, step_minutes=FRAME_STEP_MINUTES):
+    """Linearly interpolate every `step_minutes` between consecutive horizons in one vectorized step.
+
+    Returns cell coordinates once plus a (n_frames, n_cells) float32 value array, for the
+    cells that have a value at every horizon.
+    """
+    grid_x, grid_y, _ = grid
+    stacked = np.stack([grids[column] for column in KRIGING_COLUMNS])  # (horizons, ny, nx)
+    rows, cols = np.nonzero(np.isfinite(stacked).all(axis=0))
+    values = stacked[:, rows, cols]  # (horizons, n_cells)
+
+    # ✅ Fractional horizon of every frame, then one weighted blend of neighbouring horizons
+    minutes = np.arange(0, (len(KRIGING_COLUMNS) - 1) * 60 + 1, step_minutes)
+    position = minutes / 60
+    lower = np.minimum(np.floor(position).astype(int), len(KRIGING_COLUMNS) - 2)
+    weight = (position - lower)[:, None]
+    frames = ((1 - weight) * values[lower] + weight * values[lower + 1]).astype(np.float32)
+
+    lons, lats = get_transformer(crs).transform(grid_x[cols], grid_y[rows])
+    return {
+        "step_minutes": step_minutes,
+        "minutes": minutes.tolist(),
+        "lat": np.asarray(lats, dtype=np.float32),
+        "lon": np.asarray(lons, dtype=np.float32),
+        "values": frames,
+    }
+
+
+def set_frames(region_id, version, snapshot_time, frames):
+    """Serialize the frames of a new snapshot once; requests only pick a pre-built payload."""
+    times = [
+        (snapshot_time + datetime.timedelta(minutes=int(m))).strftime("%Y-%m-%dT%H:%M:%SZ")
+        for m in frames["minutes"]
+    ]
+    meta = {
+        "version": version,
+        "step_minutes": frames["step_minutes"],
+        "n_frames": len(frames["minutes"]),
+        "times": times,
+        "cells": np.round(np.column_stack([frames["lat"], frames["lon"]]).astype(float), 5).tolist(),
+    }
+    payloads = [
+        json.dumps(
+            {"index": i, "minutes": frames["minutes"][i], "time": times[i], "values": np.round(row.astype(float), 6).tolist()},
+            separators=(",", ":"),
+        ).encode()
+        for i, row in enumerate(frames["values"])
+    ]
+
+    with _lock:
+        _frames[region_id] = {
+            "version": version,
+            "meta": json.dumps(meta, separators=(",", ":")).encode(),
+            "frames": payloads,
+        }
+
+
+def get_frames(region_id):
+    """Pre-serialized frames for the region's current snapshot, or None."""
+    with _lock:
+        return _frames.get(region_id)
@@ -0,0 +1,193 @@
+import os
+import json
+import shutil
+import datetime
+import threading
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+import pandas as pd
+
+from scripts.kriging import KRIGING_COLUMNS
+
+# ✅ Append-only store: data/history/<region>/<YYYY-MM-DD>/{stations.csv, grid_<HHMMSS>.npz}
+HISTORY_DIR = "data/history"
+INDEX_FILE = "index.jsonl"
+STATION_FILE = "stations.csv"
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# ✅ Retention: full hourly grids for recent days, every Nth hour after that, nothing past the limit
+FULL_RESOLUTION_DAYS = 14
+DOWNSAMPLE_HOURS = 6
+RETENTION_DAYS = 180
+
+# ✅ Bounds on one /pollution/history request
+MAX_HISTORY_DAYS = 7
+MAX_HISTORY_SNAPSHOTS = 200
+
+STATION_COLUMNS = ["station_id", "latitude", "longitude", "measurement_datetime_utc"] + KRIGING_COLUMNS + ["model_version"]
+
+_index_cache = {}  # region_id -> sorted list of index entries
+_index_lock = threading.Lock()
+
+
+def format_timestamp(dt):
+    """UTC timestamp string used as the store key (sorts lexicographically)."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(datetime.timezone.utc)
+    return dt.strftime(TIMESTAMP_FORMAT)
+
+
+def parse_timestamp(value):
+    """Parse an ISO-8601 string (naive values are treated as UTC) into a datetime."""
+    dt = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.astimezone(datetime.timezone.utc)
+
+
+def _region_dir(region_id):
+    return os.path.join(HISTORY_DIR, region_id)
+
+
+def _load_index(region_id):
+    """Index entries for a region, read from disk once and then kept in memory."""
+    if region_id not in _index_cache:
+        entries = []
+        index_path = os.path.join(_region_dir(region_id), INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+        entries.sort(key=lambda e: e["timestamp"])
+        _index_cache[region_id] = entries
+    return _index_cache[region_id]
+
+
+def _write_index(region_id, entries):
+    """Atomically replace the index file (only used by retention)."""
+    index_path = os.path.join(_region_dir(region_id), INDEX_FILE)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+    os.replace(tmp_path, index_path)
+
+
+def record_snapshot(region_id, timestamp, sensor_df, interpolations):
+    """Append one refresh: station predictions to the day partition and the grid as a compressed array.
+
+    Snapshots are unique per (region, timestamp); a repeated hour is skipped and returns None.
+    """
+    key = format_timestamp(timestamp)
+    with _index_lock:
+        if any(e["timestamp"] == key for e in _load_index(region_id)):
+            print(f"⚠️ Skipping history snapshot for {region_id} at {key}: already recorded.")
+            return None
+
+    partition = key[:10]
+    partition_dir = os.path.join(_region_dir(region_id), partition)
+    os.makedirs(partition_dir, exist_ok=True)
+
+    # ✅ Per-station predictions, appended to the day's CSV
+    stations = pd.DataFrame(sensor_df).reindex(columns=STATION_COLUMNS)
+    stations.insert(0, "timestamp", key)
+    station_path = os.path.join(partition_dir, STATION_FILE)
+    stations.to_csv(station_path, mode="a", header=not os.path.exists(station_path), index=False)
+
+    # ✅ Interpolated grid, one (lat, lon, value) float32 array per horizon
+    # ✅ Named by the full time of day and opened exclusively, so an existing grid is never overwritten
+    grid_file = f"grid_{key[11:13]}{key[14:16]}{key[17:19]}.npz"
+    with open(os.path.join(partition_dir, grid_file), "xb") as f:
+        np.savez_compressed(
+            f, **{column: np.asarray(points, dtype=np.float32).reshape(-1, 3) for column, points in interpolations.items()}
+        )
+
+    entry = {"timestamp": key, "partition": partition, "grid_file": grid_file, "n_stations": len(stations)}
+
+    with _index_lock:
+        entries = _load_index(region_id)
+        with open(os.path.join(_region_dir(region_id), INDEX_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        entries.insert(bisect_right([e["timestamp"] for e in entries], key), entry)
+
+    return entry
+
+
+def list_snapshots(region_id, start=None, end=None):
+    """Index entries with `start <= timestamp <= end` (either bound may be None)."""
+    with _index_lock:
+        entries = list(_load_index(region_id))
+
+    keys = [e["timestamp"] for e in entries]
+    lo = bisect_left(keys, format_timestamp(start)) if start else 0
+    hi = bisect_right(keys, format_timestamp(end)) if end else len(keys)
+    return entries[lo:hi]
+
+
+def load_grid(region_id, entry):
+    """Load a stored grid back into the `perform_all_kriging` output format."""
+    if not entry.get("grid_file"):
+        return None  # ✅ Downsampled away by retention
+    path = os.path.join(_region_dir(region_id), entry["partition"], entry["grid_file"])
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as grid:
+        return {column: grid[column].tolist() for column in grid.files}
+
+
+def iter_history(region_id, start=None, end=None, include_grid=True, limit=None):
+    """Yield one NDJSON line per stored snapshot in the range (at most `limit`), reading each day partition once."""
+    current_partition, partition_stations = None, None
+
+    for entry in list_snapshots(region_id, start, end)[:limit]:
+        if entry["partition"] != current_partition:
+            current_partition = entry["partition"]
+            station_path = os.path.join(_region_dir(region_id), current_partition, STATION_FILE)
+            partition_stations = pd.read_csv(station_path) if os.path.exists(station_path) else pd.DataFrame()
+
+        record = {"timestamp": entry["timestamp"]}
+        if not partition_stations.empty:
+            stations = partition_stations[partition_stations["timestamp"] == entry["timestamp"]]
+            record["stations"] = json.loads(stations.drop(columns="timestamp").to_json(orient="records"))
+        if include_grid:
+            record["grid"] = load_grid(region_id, entry)
+
+        yield json.dumps(record) + "\n"
+
+
+def apply_retention(region_id, now=None):
+    """Downsample old grids and drop partitions past the retention window."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    full_resolution_cutoff = format_timestamp(now - datetime.timedelta(days=FULL_RESOLUTION_DAYS))
+    retention_cutoff = format_timestamp(now - datetime.timedelta(days=RETENTION_DAYS))
+
+    with _index_lock:
+        entries = _load_index(region_id)
+        kept, changed = [], False
+
+        for entry in entries:
+            if entry["timestamp"] < retention_cutoff:
+                changed = True
+                continue
+
+            keep_grid = entry["timestamp"] >= full_resolution_cutoff or int(entry["timestamp"][11:13]) % DOWNSAMPLE_HOURS == 0
+            if not keep_grid and entry.get("grid_file"):
+                grid_path = os.path.join(_region_dir(region_id), entry["partition"], entry["grid_file"])
+                if os.path.exists(grid_path):
+                    os.remove(grid_path)
+                entry = {**entry, "grid_file": None}
+                changed = True
+
+            kept.append(entry)
+
+        if not changed:
+            return
+
+        _write_index(region_id, kept)
+        _index_cache[region_id] = kept
+
+    # ✅ Remove whole day partitions that fell out of the window
+    for partition in os.listdir(_region_dir(region_id)):
+        partition_dir = os.path.join(_region_dir(region_id), partition)
+        if os.path.isdir(partition_dir) and partition < retention_cutoff[:10]:
+            shutil.rmtree(partition_dir, ignore_errors=True)
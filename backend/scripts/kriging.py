@@ -1,29 +1,53 @@
+import os
+import multiprocessing as mp
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import Point
+import shapely
 from pykrige.ok import OrdinaryKriging
 from pyproj import Transformer
+from scipy.spatial import cKDTree
 
 # ✅ Define CRS
 UTM_ZONE = "EPSG:32654"  # Tokyo UTM Zone
 GEOGRAPHIC_CRS = "EPSG:4326"  # WGS84 Lat/Lon
 
+KRIGING_COLUMNS = ["NO2_t", "NO2_T+1", "NO2_T+2", "NO2_T+3", "NO2_T+4"]
+
+# ✅ Nugget as a fraction of the sill: ppm variances are ~1e-5, so a fixed nugget of 1 inverts the variogram
+NUGGET_FRACTION = 0.1
+VARIOGRAM_RANGE = 10000
+
+
+@lru_cache(maxsize=None)
+def get_transformer(crs=UTM_ZONE):
+    """Cached transformer from a projected CRS back to WGS84 (EPSG:4326)."""
+    return Transformer.from_crs(crs, GEOGRAPHIC_CRS, always_xy=True)
+
+
 # ✅ Define transformer to convert UTM (EPSG:32654) → WGS84 (EPSG:4326)
-transformer = Transformer.from_crs(UTM_ZONE, GEOGRAPHIC_CRS, always_xy=True)
+transformer = get_transformer(UTM_ZONE)
 
-def transform_utm_to_geographic(points):
+def transform_utm_to_geographic(points, crs=UTM_ZONE):
     """Convert UTM coordinates (X, Y) back to geographic coordinates (lat, lon)."""
-    lons, lats = transformer.transform([p[0] for p in points], [p[1] for p in points])
+    lons, lats = get_transformer(crs).transform([p[0] for p in points], [p[1] for p in points])
     return list(zip(lats, lons))  # ✅ Return (lat, lon) pairs
 
 
+# ✅ Load any boundary file in the given projected CRS
+def load_boundary(filepath, crs=UTM_ZONE):
+    boundary_gdf = gpd.read_file(filepath)
+    if boundary_gdf.crs is None:
+        boundary_gdf.set_crs(epsg=4326, inplace=True)
+    return boundary_gdf.to_crs(crs)
+
+
 # ✅ Load Tokyo boundary data in UTM
 def load_tokyo_special_wards(filepath="data/tokyo_special_ward_topo.json"):
-    special_wards_gdf = gpd.read_file(filepath)
-    if special_wards_gdf.crs is None:
-        special_wards_gdf.set_crs(epsg=4326, inplace=True)
-    return special_wards_gdf.to_crs(UTM_ZONE)  # ✅ Keep in UTM
+    return load_boundary(filepath, UTM_ZONE)  # ✅ Keep in UTM
 
 
 # ✅ Load live NO₂ predictions in UTM
@@ -33,23 +57,33 @@ def load_live_predictions(filepath="data/live_predictions.csv"):
     return gdf.to_crs(UTM_ZONE)  # ✅ Convert to UTM only once
 
 
-def perform_all_kriging(sensor_df, tokyo_gdf):
-    """Performs Kriging for NO₂ concentration in UTM coordinates, then converts to lat/lon."""
+def build_grid(tokyo_gdf, grid_size=50):
+    """Uniform grid over the boundary bounds plus its inside mask, computed once per region."""
+    minx, miny, maxx, maxy = tokyo_gdf.total_bounds
+    grid_x = np.linspace(minx, maxx, grid_size)  # UTM X (Longitude)
+    grid_y = np.linspace(miny, maxy, grid_size)  # UTM Y (Latitude)
+    return grid_x, grid_y, grid_inside_mask(tokyo_gdf, grid_x, grid_y)
 
-    best_variogram = "gaussian"
-    best_range = 10000
-    best_nugget = 1
 
-    # ✅ Get spatial bounds from Tokyo UTM map
-    minx, miny, maxx, maxy = tokyo_gdf.total_bounds
+def perform_all_kriging(sensor_df, tokyo_gdf, grid=None, crs=UTM_ZONE):
+    """Performs Kriging for NO₂ concentration in UTM coordinates, then converts to lat/lon.
+
+    `grid` is an optional precomputed `build_grid` result; `crs` is the projected CRS
+    of `sensor_df` and `tokyo_gdf`.
+    """
 
-    # ✅ Create a uniform grid in UTM coordinates
-    grid_x = np.linspace(minx, maxx, 50)  # UTM X (Longitude)
-    grid_y = np.linspace(miny, maxy, 50)  # UTM Y (Latitude)
+    best_variogram = "gaussian"
+    best_range = VARIOGRAM_RANGE
+
+    # ✅ Uniform grid in UTM coordinates and the cells inside the boundary
+    if grid is None:
+        grid = build_grid(tokyo_gdf)
+    grid_x, grid_y, inside = grid
+    cols, rows = np.nonzero(inside.T)  # ✅ x-major cell order
 
     interpolations = {}
 
-    for column in ["NO2_t", "NO2_T+1", "NO2_T+2", "NO2_T+3", "NO2_T+4"]:
+    for column in KRIGING_COLUMNS:
         # ✅ Ensure sensor data remains in UTM
         sensor_gdf = sensor_df.copy()
 
@@ -58,33 +92,162 @@ def perform_all_kriging(sensor_df, tokyo_gdf):
         sensor_y = sensor_gdf.geometry.y.values  # UTM Y
         sensor_values = sensor_df[column].values  # NO₂ Concentrations
 
-        # ✅ Perform Kriging
-        OK = OrdinaryKriging(
-            sensor_x, sensor_y, sensor_values,
-            variogram_model=best_variogram,
-            variogram_parameters={"sill": np.var(sensor_values), "range": best_range, "nugget": best_nugget},
-            nlags=20, weight=True
-        )
-
-        z_kriged, _ = OK.execute("grid", grid_x, grid_y)
+        sill = np.var(sensor_values)
+        best_nugget = NUGGET_FRACTION * sill
 
-        # ✅ Store interpolated results where inside Tokyo boundary
-        heatmap_data = []
-        utm_points = []
+        if np.ptp(sensor_values) > 0:
+            # ✅ Perform Kriging
+            OK = OrdinaryKriging(
+                sensor_x, sensor_y, sensor_values,
+                variogram_model=best_variogram,
+                variogram_parameters={"sill": sill, "range": best_range, "nugget": best_nugget},
+                nlags=20, weight=True
+            )
 
-        for i, x in enumerate(grid_x):
-            for j, y in enumerate(grid_y):
-                point = Point(x, y)
-                if tokyo_gdf.geometry.contains(point).any():  # ✅ Filter inside Tokyo
-                    z_value = float(z_kriged[j, i])  # ✅ Ensure float values
+            z_kriged, _ = OK.execute("grid", grid_x, grid_y)
+        else:
+            z_kriged = np.full((len(grid_y), len(grid_x)), float(np.mean(sensor_values)))  # ✅ Constant field, nothing to krige
 
-                    if not np.isnan(z_value):  # ✅ Remove NaNs
-                        utm_points.append((x, y, z_value))
+        # ✅ Store interpolated results where inside the boundary, without NaNs
+        z_inside = np.ma.filled(z_kriged, np.nan)[rows, cols].astype(float)
+        valid = ~np.isnan(z_inside)
+        utm_points = list(zip(grid_x[cols[valid]], grid_y[rows[valid]], z_inside[valid]))
 
         # ✅ Convert UTM points to Lat/Lon
-        lat_lon_points = transform_utm_to_geographic([(p[0], p[1]) for p in utm_points])
+        lat_lon_points = transform_utm_to_geographic([(p[0], p[1]) for p in utm_points], crs)
         heatmap_data = [[lat, lon, val] for (lat, lon), (_, _, val) in zip(lat_lon_points, utm_points)]
 
-        interpolations[column] = heatmap_data  # ✅ Now data is in (lat, lon, value) format
+        interpolations[column] = [[float(lat), float(lon), float(val)] for lat, lon, val in heatmap_data]  # ✅ Now data is in (lat, lon, value) format
+
+    return interpolations  # ✅ Returns correctly formatted data
+
+
+def grid_inside_mask(tokyo_gdf, grid_x, grid_y):
+    """Boolean (len(grid_y), len(grid_x)) mask of grid cells inside the Tokyo boundary."""
+    xx, yy = np.meshgrid(grid_x, grid_y)
+    boundary = tokyo_gdf.geometry.union_all()
+    return shapely.contains_xy(boundary, xx, yy)
+
+
+def _krige_group(task):
+    """Solve one local kriging system and evaluate it at every cell sharing its neighbour set."""
+    station_x, station_y, values, sill, cell_x, cell_y = task
+    if np.ptp(values) == 0:
+        return np.full(len(cell_x), float(np.mean(values)))  # ✅ Constant field, nothing to krige
+
+    OK = OrdinaryKriging(
+        station_x, station_y, values,
+        variogram_model="gaussian",
+        variogram_parameters={"sill": sill, "range": VARIOGRAM_RANGE, "nugget": NUGGET_FRACTION * sill},
+        nlags=min(20, max(len(values) - 1, 1)), weight=True
+    )
+    z_kriged, _ = OK.execute("points", cell_x, cell_y)
+    return np.asarray(z_kriged, dtype=float)
+
+
+def perform_local_kriging(sensor_df, tokyo_gdf, n_neighbors=16, search_radius=None,
+                          tile_size=5, grid=None, n_jobs=None, crs=UTM_ZONE):
+    """Moving-window Kriging: each tile of grid cells is solved against its nearest stations only.
+
+    Stations are indexed in a KD-tree. Every `tile_size` x `tile_size` block of grid cells
+    takes the `n_neighbors` closest stations to its centre (or all stations within
+    `search_radius` metres, falling back to the nearest ones if too few are found).
+    Tiles that end up with the same neighbour set share a single solve, and the
+    solves are spread across `n_jobs` processes. Output matches `perform_all_kriging`.
+    """
+    n_neighbors = max(3, min(n_neighbors, len(sensor_df)))
+
+    # ✅ Same grid as the global solver, restricted to cells inside Tokyo
+    if grid is None:
+        grid = build_grid(tokyo_gdf)
+    grid_x, grid_y, inside = grid
+    grid_size = len(grid_x)
+    cols, rows = np.nonzero(inside.T)  # ✅ Same x-major cell order as the global solver
+    cell_x, cell_y = grid_x[cols], grid_y[rows]
+
+    # ✅ Index stations once
+    sensor_x = sensor_df.geometry.x.values
+    sensor_y = sensor_df.geometry.y.values
+    tree = cKDTree(np.column_stack([sensor_x, sensor_y]))
+
+    # ✅ Assign each cell to a tile and look up the neighbours of every tile centre
+    tile_ids = (rows // tile_size) * ((grid_size + tile_size - 1) // tile_size) + cols // tile_size
+    unique_tiles, tile_of_cell = np.unique(tile_ids, return_inverse=True)
+    tile_centres = np.column_stack([
+        np.bincount(tile_of_cell, weights=cell_x) / np.bincount(tile_of_cell),
+        np.bincount(tile_of_cell, weights=cell_y) / np.bincount(tile_of_cell),
+    ])
+    _, nearest = tree.query(tile_centres, k=n_neighbors)
+    nearest = np.atleast_2d(nearest)
+
+    if search_radius is not None:
+        in_radius = tree.query_ball_point(tile_centres, r=search_radius)
+        neighbour_sets = [
+            tuple(sorted(found)) if len(found) >= 3 else tuple(sorted(nearest[t]))
+            for t, found in enumerate(in_radius)
+        ]
+    else:
+        neighbour_sets = [tuple(sorted(row)) for row in nearest]
+
+    # ✅ Tiles with identical neighbour sets share one solve
+    groups = {}
+    for t, key in enumerate(neighbour_sets):
+        groups.setdefault(key, []).append(t)
+    group_cells = []
+    for key, tiles in groups.items():
+        group_cells.append((np.array(key), np.flatnonzero(np.isin(tile_of_cell, tiles))))
+
+    # ✅ One task per (column, neighbour set), all dispatched in a single pool
+    tasks = []
+    for column in KRIGING_COLUMNS:
+        sensor_values = sensor_df[column].values
+        sill = np.var(sensor_values)  # ✅ Global sill keeps windows consistent with each other
+        tasks.extend(
+            (sensor_x[idx], sensor_y[idx], sensor_values[idx], sill, cell_x[cells], cell_y[cells])
+            for idx, cells in group_cells
+        )
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs > 1 and len(tasks) > 1:
+        # ✅ Spawn, not fork: this runs inside refresh workers that have TensorFlow loaded
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=mp.get_context("spawn")) as executor:
+            chunksize = max(1, len(tasks) // (4 * n_jobs))
+            results = list(executor.map(_krige_group, tasks, chunksize=chunksize))
+    else:
+        results = [_krige_group(task) for task in tasks]
+
+    interpolations = {}
 
-    return interpolations  # ✅ Returns correctly formatted data
\ No newline at end of file
+    for c, column in enumerate(KRIGING_COLUMNS):
+        z_values = np.full(len(cell_x), np.nan)
+        column_results = results[c * len(group_cells):(c + 1) * len(group_cells)]
+        for (_, cells), z_group in zip(group_cells, column_results):
+            z_values[cells] = z_group
+
+        # ✅ Drop NaNs and convert UTM points to Lat/Lon
+        valid = ~np.isnan(z_values)
+        lons, lats = get_transformer(crs).transform(cell_x[valid], cell_y[valid])
+        interpolations[column] = [
+            [float(lat), float(lon), float(val)] for lat, lon, val in zip(lats, lons, z_values[valid])
+        ]
+
+    return interpolations
+
+
+def interpolations_to_grid(interpolations, grid, crs=UTM_ZONE):
+    """Put `[lat, lon, value]` points back on the (len(grid_y), len(grid_x)) grid; NaN where missing."""
+    grid_x, grid_y, _ = grid
+    dx, dy = grid_x[1] - grid_x[0], grid_y[1] - grid_y[0]
+    to_utm = Transformer.from_crs(GEOGRAPHIC_CRS, crs, always_xy=True)
+
+    grids = {}
+    for column, points in interpolations.items():
+        field = np.full((len(grid_y), len(grid_x)), np.nan)
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        if len(points):
+            x, y = to_utm.transform(points[:, 1], points[:, 0])
+            cols = np.clip(np.rint((np.asarray(x) - grid_x[0]) / dx).astype(int), 0, len(grid_x) - 1)
+            rows = np.clip(np.rint((np.asarray(y) - grid_y[0]) / dy).astype(int), 0, len(grid_y) - 1)
+            field[rows, cols] = points[:, 2]
+        grids[column] = field
+    return grids
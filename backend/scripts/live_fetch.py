@@ -3,6 +3,7 @@ import os
 import requests
 import time
 import json
+import threading
 import datetime
 import pytz
 import pandas as pd
@@ -12,6 +13,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 # Import API keys from config
 from config import Config
+from scripts.stations import sync_stations, list_stations, record_fetch_results, weather_clusters
 
 # Set timezone for Tokyo & UTC
 TOKYO_TZ = pytz.timezone("Asia/Tokyo")
@@ -21,15 +23,17 @@ UTC_TZ = pytz.UTC
 REQUESTS_PER_MINUTE = 60
 REQUEST_INTERVAL = 1  # Ensures at most 60 requests per minute
 last_request_time = time.time()
+rate_limit_lock = threading.Lock()  # Regions refresh in parallel but share the API keys
 
 
 def enforce_rate_limit():
     """Ensures we don’t exceed API request limits."""
     global last_request_time
-    time_since_last_request = time.time() - last_request_time
-    if time_since_last_request < REQUEST_INTERVAL:
-        time.sleep(REQUEST_INTERVAL - time_since_last_request)
-    last_request_time = time.time()
+    with rate_limit_lock:
+        time_since_last_request = time.time() - last_request_time
+        if time_since_last_request < REQUEST_INTERVAL:
+            time.sleep(REQUEST_INTERVAL - time_since_last_request)
+        last_request_time = time.time()
 
 
 def round_to_last_full_hour(dt):
@@ -151,14 +155,24 @@ def fetch_forecast_weather(latitude, longitude):
 
     return {}
 
-def fetch_all_data():
-    """Fetch NO₂ and weather data for all stations."""
-    try:
-        with open("data/no2_sensors.json", "r", encoding="utf-8") as file:
-            sensors_data = json.load(file)
-    except FileNotFoundError:
-        print("❌ Error: 'no2_sensors.json' file not found.")
-        return
+def fetch_all_data(sensors_file="data/no2_sensors.json", output_path="data/live_no2_weather_data.csv", region_id=None):
+    """Fetch NO₂ and weather data for all stations.
+
+    With `region_id`, stations come from the station registry: only live sensors that are not
+    backed off are fetched, and nearby stations share one set of weather calls.
+    """
+    if region_id is not None:
+        sync_stations(region_id)
+        sensors_data = list_stations(region_id, due_only=True)
+        weather_leaders = weather_clusters(region_id, sensors_data)
+    else:
+        try:
+            with open(sensors_file, "r", encoding="utf-8") as file:
+                sensors_data = json.load(file)
+        except FileNotFoundError:
+            print(f"❌ Error: '{sensors_file}' file not found.")
+            return
+        weather_leaders = {}
 
     if not sensors_data:
         print("❌ No sensor data available.")
@@ -167,6 +181,8 @@ def fetch_all_data():
     print("\n📡 Fetching NO₂ & Weather Data for All Stations...\n")
 
     data_records = []  # Store all station data
+    weather_cache = {}  # Weather per cluster leader's sensor_id
+    fetch_results = {}  # sensor_id -> got a value
 
     for station in sensors_data:
         station_id = station["station_id"]
@@ -189,10 +205,18 @@ def fetch_all_data():
         print(f"Ordered past NO₂ values: {past_values}")  # Debug print
 
         estimated_t0 = estimate_t0(current_no2, past_values)
-
-        # Fetch Weather Data
-        weather_past = fetch_historical_weather(latitude, longitude, timestamp_utc)
-        weather_future = fetch_forecast_weather(latitude, longitude)
+        fetch_results[sensor_id] = estimated_t0 is not None
+
+        # Fetch Weather Data (once per cluster of nearby stations)
+        leader = weather_leaders.get(str(sensor_id), station)
+        leader_id = leader["no2_sensor"]["sensor_id"]
+        if leader_id not in weather_cache:
+            leader_lat, leader_lon = leader["coordinates"]["latitude"], leader["coordinates"]["longitude"]
+            weather_cache[leader_id] = (
+                fetch_historical_weather(leader_lat, leader_lon, timestamp_utc),
+                fetch_forecast_weather(leader_lat, leader_lon),
+            )
+        weather_past, weather_future = weather_cache[leader_id]
 
         # Prepare Data Row
         row = {
@@ -231,12 +255,17 @@ def fetch_all_data():
         # Append station data to list
         data_records.append(row)
 
+    # ✅ Freshness & failure counts drive which sensors the next refresh skips
+    if region_id is not None:
+        record_fetch_results(region_id, fetch_results)
+        print(f"✅ {len(sensors_data)} stations fetched with {len(weather_cache)} weather lookups")
+
     # Create DataFrame from all station data
     df = pd.DataFrame(data_records)
 
     # Save DataFrame
-    df.to_csv("data/live_no2_weather_data.csv", index=False)
-    print("✅ Data saved to data/live_no2_weather_data.csv")
+    df.to_csv(output_path, index=False)
+    print(f"✅ Data saved to {output_path}")
 
 
 if __name__ == "__main__":
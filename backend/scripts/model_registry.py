@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import datetime
+
+import numpy as np
+import pandas as pd
+import joblib
+import keras
+
+# Ensure the script can find the scripts package when run directly
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scripts.features import samples_to_live_order
+
+# ✅ models/registry/<version>/{model.keras, scaler.pkl, metadata.json}, plus active.json
+REGISTRY_DIR = "models/registry"
+ACTIVE_FILE = os.path.join(REGISTRY_DIR, "active.json")
+MODEL_FILE = "model.keras"
+SCALER_FILE = "scaler.pkl"
+METADATA_FILE = "metadata.json"
+
+# ✅ Model used before the registry existed; served as version "legacy" until one is activated
+LEGACY_MODEL_PATH = "models/no2_forecast_model.keras"
+LEGACY_SCALER_PATH = "data/scaler.pkl"
+LEGACY_VERSION = "legacy"
+
+# ✅ Validation: held-out batch with known targets, and how much worse a candidate may be
+HOLDOUT_PATH = "data/evaluation_data_for_model.csv"
+HOLDOUT_ROWS = 256
+TARGET_COLUMNS = [f"NO2_target_T+{i}" for i in range(1, 5)]
+MAX_MAE_REGRESSION = 0.25  # ✅ Reject candidates more than 25% worse than the active model
+
+
+class ModelValidationError(Exception):
+    pass
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _version_dir(version):
+    return os.path.join(REGISTRY_DIR, version)
+
+
+def register_model(model_path, scaler_path, trained_at=None, notes=None):
+    """Copy a trained model & scaler into the registry as a new version (not activated)."""
+    scaler = joblib.load(scaler_path)
+    version = datetime.datetime.now(datetime.timezone.utc).strftime("v%Y%m%dT%H%M%SZ")
+    version_dir = _version_dir(version)
+    os.makedirs(version_dir)
+
+    shutil.copy2(model_path, os.path.join(version_dir, MODEL_FILE))
+    shutil.copy2(scaler_path, os.path.join(version_dir, SCALER_FILE))
+
+    metadata = {
+        "version": version,
+        "trained_at": trained_at or datetime.datetime.fromtimestamp(os.path.getmtime(model_path), datetime.timezone.utc).isoformat(),
+        "registered_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "features": scaler.feature_names_in_.tolist(),
+        "checksums": {
+            MODEL_FILE: sha256_file(os.path.join(version_dir, MODEL_FILE)),
+            SCALER_FILE: sha256_file(os.path.join(version_dir, SCALER_FILE)),
+        },
+        "notes": notes,
+    }
+    with open(os.path.join(version_dir, METADATA_FILE), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+
+    print(f"✅ Registered model version {version}")
+    return version
+
+
+def list_versions():
+    """Metadata of every registered version, newest first."""
+    if not os.path.isdir(REGISTRY_DIR):
+        return []
+    versions = []
+    for name in os.listdir(REGISTRY_DIR):
+        metadata_path = os.path.join(_version_dir(name), METADATA_FILE)
+        if os.path.isfile(metadata_path):
+            with open(metadata_path, "r", encoding="utf-8") as f:
+                versions.append(json.load(f))
+    return sorted(versions, key=lambda m: m["version"], reverse=True)
+
+
+def get_active_version():
+    if not os.path.exists(ACTIVE_FILE):
+        return LEGACY_VERSION
+    with open(ACTIVE_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)["version"]
+
+
+def set_active_version(version):
+    """Atomically point the registry at `version` (worker processes follow on their next refresh)."""
+    os.makedirs(REGISTRY_DIR, exist_ok=True)
+    tmp_path = ACTIVE_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "activated_at": datetime.datetime.now(datetime.timezone.utc).isoformat()}, f)
+    os.replace(tmp_path, ACTIVE_FILE)
+
+
+def load_version(version):
+    """Load a version after verifying its checksums. Returns a bundle dict."""
+    if version == LEGACY_VERSION:
+        scaler = joblib.load(LEGACY_SCALER_PATH)
+        model = keras.models.load_model(LEGACY_MODEL_PATH)
+        metadata = {"version": LEGACY_VERSION, "trained_at": None, "features": scaler.feature_names_in_.tolist()}
+        return {"version": version, "model": model, "scaler": scaler, "metadata": metadata}
+
+    version_dir = _version_dir(version)
+    with open(os.path.join(version_dir, METADATA_FILE), "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+
+    for filename, expected in metadata["checksums"].items():
+        if sha256_file(os.path.join(version_dir, filename)) != expected:
+            raise ModelValidationError(f"Checksum mismatch for {version}/{filename}")
+
+    scaler = joblib.load(os.path.join(version_dir, SCALER_FILE))
+    model = keras.models.load_model(os.path.join(version_dir, MODEL_FILE))
+    return {"version": version, "model": model, "scaler": scaler, "metadata": metadata}
+
+
+def load_active_bundle():
+    """Load the active version, or a bundle with no model if it cannot be loaded."""
+    version = get_active_version()
+    try:
+        print(f"📡 Loading ML model and scaler (version {version})...")
+        bundle = load_version(version)
+        print("✅ ML Model and Scaler Loaded.")
+        return bundle
+    except Exception as e:
+        print(f"❌ Error loading ML model or scaler: {e}")
+        return {"version": version, "model": None, "scaler": None, "metadata": None}
+
+
+def load_holdout():
+    """Held-out rows with known targets, as (unscaled features, targets)."""
+    df = samples_to_live_order(pd.read_csv(HOLDOUT_PATH))  # ✅ Same lag order as training & serving
+    df = df.dropna(subset=["NO2_t"] + TARGET_COLUMNS).head(HOLDOUT_ROWS)
+    return df, df[TARGET_COLUMNS].to_numpy(dtype=float)
+
+
+def predict_bundle(bundle, features):
+    """Scale and predict unscaled feature rows with a bundle's own scaler & model."""
+    expected = bundle["scaler"].feature_names_in_.tolist()
+    X = features.reindex(columns=expected)
+    X = X.fillna(X.mean())
+    scaled = bundle["scaler"].transform(X)
+    return np.asarray(bundle["model"].predict(scaled.reshape((scaled.shape[0], 1, scaled.shape[1])), verbose=0))
+
+
+def validate_bundle(candidate, active=None):
+    """Warm up the candidate and check it against the held-out batch (and the active model)."""
+    expected = candidate["scaler"].feature_names_in_.tolist()
+    if candidate["metadata"]["features"] != expected:
+        raise ModelValidationError("Scaler features do not match the registered feature list")
+
+    features, targets = load_holdout()
+    missing = set(expected) - set(features.columns)
+    if missing:
+        raise ModelValidationError(f"Held-out batch is missing features: {sorted(missing)}")
+
+    predictions = predict_bundle(candidate, features)  # ✅ Also warms up the model
+    if predictions.shape != targets.shape:
+        raise ModelValidationError(f"Expected predictions of shape {targets.shape}, got {predictions.shape}")
+    if not np.isfinite(predictions).all():
+        raise ModelValidationError("Candidate produced non-finite predictions")
+
+    report = {"holdout_rows": len(targets), "mae": float(np.mean(np.abs(predictions - targets)))}
+
+    if active is not None and active.get("model") is not None:
+        active_mae = float(np.mean(np.abs(predict_bundle(active, features) - targets)))
+        report["active_mae"] = active_mae
+        if report["mae"] > active_mae * (1 + MAX_MAE_REGRESSION):
+            raise ModelValidationError(
+                f"Candidate MAE {report['mae']:.5f} is more than {MAX_MAE_REGRESSION:.0%} worse than active {active_mae:.5f}"
+            )
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the NO₂ model registry.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    register_parser = subparsers.add_parser("register", help="Register a trained model & scaler")
+    register_parser.add_argument("model_path", nargs="?", default=LEGACY_MODEL_PATH)
+    register_parser.add_argument("scaler_path", nargs="?", default=LEGACY_SCALER_PATH)
+    register_parser.add_argument("--trained-at")
+    register_parser.add_argument("--notes")
+
+    subparsers.add_parser("list", help="List registered versions")
+
+    args = parser.parse_args()
+    if args.command == "register":
+        register_model(args.model_path, args.scaler_path, args.trained_at, args.notes)
+    else:
+        print(f"Active: {get_active_version()}")
+        for metadata in list_versions():
+            print(f"{metadata['version']}  trained {metadata['trained_at']}  {metadata.get('notes') or ''}")
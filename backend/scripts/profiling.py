@@ -0,0 +1,132 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import datetime
+import threading
+import tracemalloc
+from collections import Counter
+
+# ✅ Profiles are only taken on request; nothing here runs during normal refreshes
+PROFILE_DIR = "data/profiles"
+PROFILE_MODES = ("sampling", "deterministic")
+SAMPLE_INTERVAL_SECONDS = 0.005
+TOP_STATS = 50
+MAX_PROFILES = 20  # ✅ Older profiles (all of their artifacts) are deleted
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval and counts collapsed stacks."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL_SECONDS):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed-stack format, ready for flamegraph.pl / speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def new_profile_id(region_id, mode):
+    return f"{datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')}_{region_id}_{mode}"
+
+
+def run_profiled(func, profile_id, mode="sampling", memory=False):
+    """Run `func()` under the requested profilers and write the artifacts to PROFILE_DIR."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, profile_id)
+
+    sampler = StackSampler(threading.get_ident())
+    profiler = cProfile.Profile() if mode == "deterministic" else None
+
+    if memory:
+        tracemalloc.start(25)
+    sampler.start()
+    if profiler:
+        profiler.enable()
+    start = time.perf_counter()
+
+    try:
+        result = func()
+    finally:
+        elapsed = time.perf_counter() - start
+        if profiler:
+            profiler.disable()
+        sampler.stop()
+
+        with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+            f.write(sampler.collapsed())
+
+        if profiler:
+            profiler.dump_stats(f"{base}.prof")
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(TOP_STATS)
+            with open(f"{base}.txt", "w", encoding="utf-8") as f:
+                f.write(f"Wall time: {elapsed:.3f}s\n\n{summary.getvalue()}")
+
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(f"{base}.memory.txt", "w", encoding="utf-8") as f:
+                f.write(f"Current: {current / 1e6:.1f} MB, peak: {peak / 1e6:.1f} MB\n\n")
+                for stat in snapshot.statistics("lineno")[:TOP_STATS]:
+                    f.write(f"{stat}\n")
+
+        print(f"🔬 Profile {profile_id} written ({elapsed:.2f}s, {sum(sampler.stacks.values())} samples)")
+        prune_profiles()
+
+    return result
+
+
+def list_profiles():
+    """Profile artifacts on disk, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    files = []
+    for name in os.listdir(PROFILE_DIR):
+        path = os.path.join(PROFILE_DIR, name)
+        if os.path.isfile(path):
+            files.append({"name": name, "bytes": os.path.getsize(path), "modified": os.path.getmtime(path)})
+    return sorted(files, key=lambda f: f["modified"], reverse=True)
+
+
+def prune_profiles(keep=MAX_PROFILES):
+    """Delete the artifacts of all but the newest `keep` profiles."""
+    profile_ids = []
+    for artifact in list_profiles():
+        profile_id = artifact["name"].split(".", 1)[0]
+        if profile_id not in profile_ids:
+            profile_ids.append(profile_id)
+
+    for artifact in list_profiles():
+        if artifact["name"].split(".", 1)[0] not in profile_ids[:keep]:
+            os.remove(os.path.join(PROFILE_DIR, artifact["name"]))
+
+
+def profile_path(name):
+    """Path of a stored artifact, or None (also for anything outside PROFILE_DIR)."""
+    if name != os.path.basename(name):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,108 @@
+import json
+import time
+import asyncio
+import threading
+
+import numpy as np
+
+# ✅ Serialized once per refresh and shared by every viewer
+KEEPALIVE_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 4
+DELTA_TOLERANCE = 1e-6  # ✅ Cells that moved less than this are left out of deltas
+STREAM_MODES = ("announce", "full", "delta")
+
+_snapshots = {}  # region_id -> latest snapshot (version, payload bytes, pre-built SSE events)
+_subscribers = {}  # region_id -> set of (loop, queue, mode)
+_lock = threading.Lock()
+
+
+def _sse_event(event, version, data):
+    return f"event: {event}\nid: {version}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+def _compute_delta(previous, interpolations):
+    """Changed cells per horizon as [index, value], or None if the grid layout changed."""
+    if previous is None:
+        return None
+
+    delta = {}
+    for column, points in interpolations.items():
+        new = np.asarray(points, dtype=float).reshape(-1, 3)
+        old = previous["arrays"].get(column)
+        if old is None or old.shape != new.shape or not np.allclose(old[:, :2], new[:, :2]):
+            return None
+        changed = np.flatnonzero(np.abs(new[:, 2] - old[:, 2]) > DELTA_TOLERANCE)
+        delta[column] = [[int(i), float(new[i, 2])] for i in changed]
+    return delta
+
+
+def publish_snapshot(region_id, interpolations):
+    """Store a new snapshot for the region and push it to every connected client."""
+    with _lock:
+        previous = _snapshots.get(region_id)
+        version = str(int(time.time() * 1000))  # ✅ Unique across restarts, usable as an ETag
+        delta = _compute_delta(previous, interpolations)
+        header = {"region": region_id, "version": version}
+
+        events = {
+            "announce": _sse_event("snapshot", version, header),
+            "full": _sse_event("snapshot", version, {**header, "data": interpolations}),
+        }
+        events["delta"] = (
+            _sse_event("delta", version, {**header, "base": previous["version"], "delta": delta})
+            if delta is not None else events["full"]
+        )
+
+        _snapshots[region_id] = {
+            "version": version,
+            "payload": json.dumps(interpolations, separators=(",", ":")).encode(),
+            "events": events,
+            "arrays": {column: np.asarray(points, dtype=float).reshape(-1, 3) for column, points in interpolations.items()},
+        }
+        subscribers = list(_subscribers.get(region_id, ()))
+
+    for loop, queue, mode in subscribers:
+        loop.call_soon_threadsafe(_offer, queue, events[mode])
+
+    return version
+
+
+def get_snapshot(region_id):
+    """Latest snapshot for the region (`version` and serialized `payload`), or None."""
+    with _lock:
+        return _snapshots.get(region_id)
+
+
+def _offer(queue, event):
+    """Queue an event for one client; a client that fell behind only gets the newest one."""
+    if queue.full():
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(event)
+
+
+async def stream_events(region_id, mode="announce", last_event_id=None):
+    """Server-Sent Events generator: current snapshot on connect, then one event per refresh."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    subscriber = (loop, queue, mode)
+
+    with _lock:
+        _subscribers.setdefault(region_id, set()).add(subscriber)
+        current = _snapshots.get(region_id)
+
+    try:
+        # ✅ Catch up a (re)connecting client; deltas need a full base first
+        if current and current["version"] != last_event_id:
+            yield current["events"]["announce" if mode == "announce" else "full"]
+
+        while True:
+            try:
+                yield await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+    finally:
+        with _lock:
+            _subscribers.get(region_id, set()).discard(subscriber)
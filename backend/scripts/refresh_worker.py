@@ -0,0 +1,304 @@
+import os
+import time
+import queue
+import pickle
+import datetime
+import traceback
+import threading
+import multiprocessing as mp
+
+import pytz
+import pandas as pd
+import geopandas as gpd
+from shapely.geometry import Point
+
+from scripts.kriging import perform_all_kriging, perform_local_kriging, interpolations_to_grid
+from scripts.live_fetch import fetch_all_data
+from scripts.history import parse_timestamp
+from scripts.contours import build_contour_layers
+from scripts.frames import build_frames
+from scripts.profiling import run_profiled
+from scripts.model_registry import get_active_version, load_active_bundle
+
+# ✅ Above this many stations, switch from one global Kriging system to local windows
+LOCAL_KRIGING_MIN_STATIONS = 200
+
+# ✅ Finished refreshes are handed to the API process as snapshot files
+SNAPSHOT_DIR = "data/snapshots"
+
+# ✅ Health checking: a worker that dies or runs a refresh longer than this is restarted
+REFRESH_TIMEOUT_SECONDS = 30 * 60
+HEALTH_CHECK_SECONDS = 1
+
+
+def compute_refresh(region, bundle, fetch=True):
+    """Fetch, predict and krige one region. Returns everything the API needs, or None on failure.
+
+    `bundle` is a model registry bundle; its version is recorded with every prediction.
+    With `fetch=False` the last live data file is reused (synthetic runs for profiling).
+    """
+    model, scaler = bundle["model"], bundle["scaler"]
+    live_data_path = region["live_data_file"]
+
+    if fetch:
+        print(f"📡 Fetching latest NO₂ & weather data for {region['name']}...")
+        fetch_all_data(region["sensors_file"], live_data_path, region["id"])  # ✅ Fetch new live data
+
+    if not os.path.exists(live_data_path):
+        print("❌ Live data file not found.")
+        return None
+
+    # ✅ Load latest data
+    live_df = pd.read_csv(live_data_path)
+
+    # ✅ Rename columns to match training data
+    rename_map = {
+        'no2lag_1': 'NO2_lag_1',
+        'no2lag_2': 'NO2_lag_2',
+        'no2lag_3': 'NO2_lag_3',
+        'no2lag_4': 'NO2_lag_4',
+        'measurement_value': 'NO2_t'
+    }
+    live_df.rename(columns=rename_map, inplace=True)
+
+    # ✅ Convert to GeoDataFrame
+    live_df["geometry"] = live_df.apply(lambda row: Point(row["longitude"], row["latitude"]), axis=1)
+    sensor_gdf = gpd.GeoDataFrame(live_df, geometry="geometry", crs="EPSG:4326")  # ✅ Set CRS to WGS84
+
+    # ✅ Transform to UTM
+    sensor_gdf = sensor_gdf.to_crs(region["crs"])  # ✅ Convert to the region's UTM Zone
+
+    # ✅ Check if ML model & scaler are available
+    if not scaler or not model:
+        print("❌ Error: ML model or scaler is not loaded. Cannot predict.")
+        return None
+
+    # ✅ Check feature compatibility
+    expected_features = scaler.feature_names_in_.tolist()
+    missing_features = set(expected_features) - set(sensor_gdf.columns)
+
+    if missing_features:
+        print(f"🚨 ERROR: Missing features in live data: {missing_features}")
+        return None
+
+    # ✅ Process data for model
+    live_processed = sensor_gdf[expected_features].copy()  # 🔥 FIX: Explicitly copy data
+    live_processed.fillna(live_processed.mean(), inplace=True)
+
+    # ✅ Scale data
+    live_scaled = pd.DataFrame(scaler.transform(live_processed), columns=expected_features)
+
+    # ✅ Reshape for LSTM model
+    X_live = live_scaled.values.reshape((live_scaled.shape[0], 1, live_scaled.shape[1]))
+
+    # ✅ Predict next NO₂ values
+    predictions = model.predict(X_live)
+
+    # ✅ Store results
+    sensor_gdf[['NO2_T+1', 'NO2_T+2', 'NO2_T+3', 'NO2_T+4']] = predictions
+    sensor_gdf["model_version"] = bundle["version"]
+    sensor_gdf.to_csv(live_data_path, index=False)
+    print(f"✅ Predictions saved to {live_data_path}")
+
+    try:
+        snapshot_time = parse_timestamp(str(sensor_gdf["measurement_datetime_utc"].iloc[0]))
+    except (KeyError, IndexError, ValueError):
+        snapshot_time = datetime.datetime.now(pytz.UTC).replace(minute=0, second=0, microsecond=0)
+
+    # ✅ Perform Kriging interpolation on the region's precomputed grid
+    if len(sensor_gdf) > LOCAL_KRIGING_MIN_STATIONS:
+        interpolations = perform_local_kriging(sensor_gdf, region["boundary"], grid=region["grid"], crs=region["crs"])
+    else:
+        interpolations = perform_all_kriging(sensor_gdf, region["boundary"], grid=region["grid"], crs=region["crs"])
+    print(f"✅ Live Kriging Interpolation Complete for {region['name']}.")
+
+    # ✅ Regrid once for tiles, and build the contour bands from the same grid
+    grids = interpolations_to_grid(interpolations, region["grid"], region["crs"])
+
+    return {
+        "snapshot_time": snapshot_time,
+        "model_version": bundle["version"],
+        "sensor_gdf": sensor_gdf,
+        "live_processed": live_processed,
+        "interpolations": interpolations,
+        "grids": grids,
+        "contours": build_contour_layers(region, grids),
+        "frames": build_frames(grids, region["grid"], region["crs"]),
+    }
+
+
+def write_snapshot_file(region_id, result):
+    """Atomically write a refresh result for the API process to pick up."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = os.path.join(SNAPSHOT_DIR, f"{region_id}.pkl")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_snapshot_file(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def run_refresh(region, bundle, profile=None):
+    """`compute_refresh`, optionally under the profiler described by `profile`.
+
+    Profiled runs only write their artifacts and return None, so they are never published.
+    """
+    if profile is None:
+        return compute_refresh(region, bundle)  # ✅ No profiling overhead by default
+
+    run_profiled(
+        lambda: compute_refresh(region, bundle, fetch=not profile["synthetic"]),
+        profile["id"], profile["mode"], profile["memory"],
+    )
+    return None
+
+
+def _worker_main(tasks, results):
+    """Worker process: load regions and model once, then refresh regions as they are requested."""
+    from scripts.regions import load_regions
+
+    pid = os.getpid()
+    regions = load_regions()
+    bundle = load_active_bundle()
+    results.put(("ready", pid, None, None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+
+        region_id, profile = task
+        results.put(("started", pid, region_id, None))
+        try:
+            # ✅ Follow model swaps / rollbacks made by the API process
+            if get_active_version() != bundle["version"]:
+                bundle = load_active_bundle()
+            result = run_refresh(regions[region_id], bundle, profile)
+            path = write_snapshot_file(region_id, result) if result else None
+            results.put(("done", pid, region_id, path))
+        except Exception:
+            results.put(("failed", pid, region_id, traceback.format_exc()))
+
+
+class RefreshWorkerPool:
+    """Runs refreshes in separate processes so they never compete with request handling for the GIL."""
+
+    def __init__(self, on_result, n_workers=1):
+        self.on_result = on_result  # ✅ Called in the API process with (region_id, snapshot path)
+        self.n_workers = n_workers
+        self.context = mp.get_context("spawn")  # ✅ TensorFlow is not fork-safe
+        self.tasks = self.context.Queue()
+        self.results = self.context.Queue()
+        self.processes = {}  # pid -> process
+        self.running = {}  # pid -> (region_id, start time)
+        self.pending = {}  # region_id -> submit time, while queued or running
+        self.restarts = 0
+        self.lock = threading.Lock()
+        self.monitor = None
+
+    def start(self):
+        for _ in range(self.n_workers):
+            self._spawn()
+        self.monitor = threading.Thread(target=self._monitor, daemon=True)
+        self.monitor.start()
+
+    def _spawn(self):
+        process = self.context.Process(target=_worker_main, args=(self.tasks, self.results), daemon=True)
+        process.start()
+        self.processes[process.pid] = process
+        print(f"🚀 Started refresh worker (pid {process.pid})")
+
+    def submit(self, region_id, profile=None):
+        """Queue a refresh; returns False if one is already queued or running for the region."""
+        with self.lock:
+            if region_id in self.pending:
+                print(f"⏳ {region_id} is already refreshing.")
+                return False
+            self.pending[region_id] = time.monotonic()
+        self.tasks.put((region_id, profile))
+        return True
+
+    def _monitor(self):
+        while True:
+            # ✅ Drain every queued message before judging worker health, so a worker that
+            # died right after reporting "started" is seen as running when it is restarted
+            timeout = HEALTH_CHECK_SECONDS
+            while True:
+                try:
+                    kind, pid, region_id, payload = self.results.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                try:
+                    self._handle(kind, pid, region_id, payload)
+                except Exception as e:
+                    print(f"❌ Error handling refresh result: {e}")
+                timeout = 0.01
+            self._check_health()
+
+    def _handle(self, kind, pid, region_id, payload):
+        if kind == "ready":
+            print(f"✅ Refresh worker {pid} ready.")
+            return
+        if kind == "started":
+            with self.lock:
+                if pid in self.processes:
+                    self.running[pid] = (region_id, time.monotonic())
+                else:
+                    self.pending.pop(region_id, None)  # ✅ Late message from a worker already replaced
+            return
+
+        with self.lock:
+            self.running.pop(pid, None)
+            self.pending.pop(region_id, None)
+
+        if kind == "failed":
+            print(f"❌ Refresh of {region_id} failed in worker {pid}:\n{payload}")
+        elif payload:
+            self.on_result(region_id, payload)
+
+    def _check_health(self):
+        with self.lock:
+            for pid, process in list(self.processes.items()):
+                job = self.running.get(pid)
+                timed_out = job is not None and time.monotonic() - job[1] > REFRESH_TIMEOUT_SECONDS
+
+                if process.is_alive() and not timed_out:
+                    continue
+
+                if timed_out:
+                    print(f"⏱️ Refresh of {job[0]} exceeded {REFRESH_TIMEOUT_SECONDS}s, restarting worker {pid}")
+                    process.terminate()
+                else:
+                    print(f"💀 Refresh worker {pid} died (exit code {process.exitcode}), restarting")
+                process.join(timeout=5)
+
+                del self.processes[pid]
+                if job is not None:
+                    self.running.pop(pid, None)
+                    self.pending.pop(job[0], None)
+                self.restarts += 1
+                self._spawn()
+
+            # ✅ A task taken by a worker that died before reporting "started" would stay pending forever
+            running_regions = {region_id for region_id, _ in self.running.values()}
+            for region_id, submitted in list(self.pending.items()):
+                if region_id not in running_regions and time.monotonic() - submitted > REFRESH_TIMEOUT_SECONDS:
+                    print(f"⏱️ {region_id} was never picked up, clearing it")
+                    del self.pending[region_id]
+
+    def status(self):
+        """Health summary for the API."""
+        with self.lock:
+            return {
+                "workers": [
+                    {"pid": pid, "alive": process.is_alive(), "refreshing": self.running.get(pid, (None,))[0]}
+                    for pid, process in self.processes.items()
+                ],
+                "pending": sorted(self.pending),
+                "restarts": self.restarts,
+            }
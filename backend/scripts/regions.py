@@ -0,0 +1,55 @@
+import os
+import threading
+
+from scripts.kriging import load_boundary, build_grid, get_transformer
+
+# ✅ Region registry: one entry per area served by this deployment.
+# To add a region, drop its boundary GeoJSON/TopoJSON and sensor list into `data/`
+# and add an entry here with the projected CRS (UTM zone) that covers it,
+# e.g. "EPSG:32653" for Osaka or "EPSG:32654" for Yokohama and Tama.
+# `bbox` (min lon, min lat, max lon, max lat) is what the station catalog sync searches.
+REGIONS = {
+    "tokyo": {
+        "name": "Tokyo Special Wards",
+        "boundary_file": "data/tokyo_special_ward_topo.json",
+        "crs": "EPSG:32654",
+        "grid_size": 50,
+        "bbox": (139.55, 35.52, 139.93, 35.83),
+        "sensors_file": "data/no2_sensors.json",
+        "live_data_file": "data/live_no2_weather_data.csv",
+    },
+}
+
+DEFAULT_REGION = "tokyo"
+
+
+def load_region(region_id):
+    """Load a region's boundary and precompute its grid mask and transformer."""
+    spec = REGIONS[region_id]
+
+    boundary_gdf = load_boundary(spec["boundary_file"], spec["crs"])
+
+    return {
+        "id": region_id,
+        **spec,
+        "boundary": boundary_gdf,
+        "grid": build_grid(boundary_gdf, spec["grid_size"]),  # ✅ Mask computed once, reused every refresh
+        "transformer": get_transformer(spec["crs"]),
+        "lock": threading.Lock(),  # ✅ One refresh at a time per region
+    }
+
+
+def load_regions():
+    """Load every registered region, skipping those whose data files are missing."""
+    regions = {}
+
+    for region_id, spec in REGIONS.items():
+        missing = [spec[key] for key in ("boundary_file", "sensors_file") if not os.path.exists(spec[key])]
+        if missing:
+            print(f"⚠️ Skipping region '{region_id}': missing {', '.join(missing)}")
+            continue
+
+        print(f"📡 Loading {spec['name']} boundary data...")
+        regions[region_id] = load_region(region_id)
+
+    return regions
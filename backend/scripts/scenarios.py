@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+
+# ✅ Only the weather forecast inputs may be changed by a scenario
+SCENARIO_FEATURE_PREFIX = "future_"
+PREDICTION_COLUMNS = ["NO2_T+1", "NO2_T+2", "NO2_T+3", "NO2_T+4"]
+
+# ✅ Micro-batching: wait this long for other requests before running one predict call
+BATCH_WINDOW_SECONDS = 0.005
+MAX_BATCH_ROWS = 65536
+PREDICT_BATCH_SIZE = 4096
+
+
+def build_scenario_matrix(base_features, scenarios):
+    """Stack one copy of the live feature rows per scenario and apply its overrides.
+
+    `scenarios` is a list of dicts with optional `overrides` (absolute values) and
+    `adjustments` (added to the live value) keyed by `future_*` feature name.
+    Returns a DataFrame of shape (len(scenarios) * n_stations, n_features).
+    """
+    columns = list(base_features.columns)
+    column_index = {name: i for i, name in enumerate(columns)}
+    base = base_features.to_numpy(dtype=float)
+    n_stations = len(base)
+
+    matrix = np.tile(base, (len(scenarios), 1))
+
+    for s, scenario in enumerate(scenarios):
+        rows = slice(s * n_stations, (s + 1) * n_stations)
+        for kind in ("overrides", "adjustments"):
+            for feature, value in (scenario.get(kind) or {}).items():
+                if not feature.startswith(SCENARIO_FEATURE_PREFIX) or feature not in column_index:
+                    raise ValueError(f"Unknown scenario feature '{feature}' (only {SCENARIO_FEATURE_PREFIX}* inputs can be changed)")
+                if kind == "overrides":
+                    matrix[rows, column_index[feature]] = value
+                else:
+                    matrix[rows, column_index[feature]] += value
+
+    return pd.DataFrame(matrix, columns=columns)
+
+
+class PredictionBatcher:
+    """Coalesce concurrent predict requests into one model call, run off the event loop."""
+
+    def __init__(self):
+        self.queue = None
+        self.worker = None
+
+    async def predict(self, X, model):
+        """Predict `X` with `model`, batched with other requests for the same model."""
+        if model is None:
+            raise RuntimeError("ML model is not loaded")
+        if self.worker is None or self.worker.done():
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((X, model, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            rows = len(batch[0][0])
+
+            # ✅ Collect whatever else arrives within the batching window
+            deadline = time.monotonic() + BATCH_WINDOW_SECONDS
+            while rows < MAX_BATCH_ROWS:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                rows += len(item[0])
+
+            # ✅ One predict call per model (only differs while a model swap is in flight)
+            by_model = {}
+            for item in batch:
+                by_model.setdefault(id(item[1]), []).append(item)
+
+            for items in by_model.values():
+                await self._predict_group(loop, items)
+
+    async def _predict_group(self, loop, items):
+        model = items[0][1]
+        try:
+            stacked = np.concatenate([X for X, _, _ in items])
+            predictions = await loop.run_in_executor(
+                None, lambda: model.predict(stacked, batch_size=PREDICT_BATCH_SIZE, verbose=0)
+            )
+        except Exception as e:
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        start = 0
+        for X, _, future in items:
+            if not future.done():
+                future.set_result(predictions[start:start + len(X)])
+            start += len(X)
@@ -0,0 +1,143 @@
+import os
+import json
+import math
+import datetime
+import threading
+
+import numpy as np
+
+from scripts.history import format_timestamp
+
+# ✅ Running forecast skill per region, station and horizon, persisted between restarts
+SKILL_DIR = "data/skill"
+HORIZONS = [1, 2, 3, 4]
+PREDICTION_COLUMNS = [f"NO2_T+{h}" for h in HORIZONS]
+
+_states = {}  # region_id -> {"pending": {timestamp: {station: [T+1..T+4]}}, "stations": {...}, "overall": {...}}
+_lock = threading.Lock()
+
+
+def _empty_accumulator():
+    return {"n": 0, "sum_err": 0.0, "sum_abs": 0.0, "sum_sq": 0.0}
+
+
+def _accumulate(acc, error):
+    acc["n"] += 1
+    acc["sum_err"] += error
+    acc["sum_abs"] += abs(error)
+    acc["sum_sq"] += error * error
+
+
+def _summarize(acc):
+    n = acc["n"]
+    if not n:
+        return {"n": 0, "mae": None, "rmse": None, "bias": None}
+    return {
+        "n": n,
+        "mae": acc["sum_abs"] / n,
+        "rmse": math.sqrt(acc["sum_sq"] / n),
+        "bias": acc["sum_err"] / n,  # ✅ Positive = over-prediction
+    }
+
+
+def _state_path(region_id):
+    return os.path.join(SKILL_DIR, f"{region_id}.json")
+
+
+def _load_state(region_id):
+    if region_id not in _states:
+        state = {"pending": {}, "stations": {}, "overall": {str(h): _empty_accumulator() for h in HORIZONS}}
+        if os.path.exists(_state_path(region_id)):
+            with open(_state_path(region_id), "r", encoding="utf-8") as f:
+                state = json.load(f)
+        _states[region_id] = state
+    return _states[region_id]
+
+
+def _save_state(region_id, state):
+    os.makedirs(SKILL_DIR, exist_ok=True)
+    tmp_path = _state_path(region_id) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, _state_path(region_id))
+
+
+def update_skill(region_id, timestamp, sensor_df):
+    """Score the forecasts issued 1–4 hours before `timestamp` against the `NO2_t` just observed.
+
+    Only the last four hours of predictions are kept, so each call is O(stations).
+    An hour that was already scored (a repeated refresh within the hour) is skipped.
+    """
+    key = format_timestamp(timestamp)
+    station_ids = sensor_df["station_id"].astype(str).tolist()
+    observed = sensor_df["NO2_t"].to_numpy(dtype=float)
+    predicted = sensor_df.reindex(columns=PREDICTION_COLUMNS).to_numpy(dtype=float)
+
+    with _lock:
+        state = _load_state(region_id)
+        if key in state["pending"]:
+            print(f"⚠️ Skipping skill update for {region_id} at {key}: hour already scored.")
+            return
+
+        # ✅ Join the new observations to the matching earlier forecasts
+        for h in HORIZONS:
+            issued = state["pending"].get(format_timestamp(timestamp - datetime.timedelta(hours=h)))
+            if not issued:
+                continue
+
+            for station_id, value in zip(station_ids, observed):
+                forecast = issued.get(station_id)
+                if forecast is None or forecast[h - 1] is None or np.isnan(value):
+                    continue
+
+                error = forecast[h - 1] - value
+                per_station = state["stations"].setdefault(station_id, {str(k): _empty_accumulator() for k in HORIZONS})
+                _accumulate(per_station[str(h)], error)
+                _accumulate(state["overall"][str(h)], error)
+
+        # ✅ Remember this hour's forecasts and forget anything no horizon can still match
+        state["pending"][key] = {
+            station_id: [None if np.isnan(p) else float(p) for p in row]
+            for station_id, row in zip(station_ids, predicted)
+        }
+        oldest = format_timestamp(timestamp - datetime.timedelta(hours=max(HORIZONS)))
+        state["pending"] = {ts: preds for ts, preds in state["pending"].items() if ts >= oldest}
+
+        _save_state(region_id, state)
+
+
+def get_skill(region_id):
+    """Current MAE / RMSE / bias per horizon, overall and per station."""
+    with _lock:
+        state = _load_state(region_id)
+        return {
+            "overall": {f"T+{h}": _summarize(state["overall"][str(h)]) for h in HORIZONS},
+            "stations": {
+                station_id: {f"T+{h}": _summarize(horizons[str(h)]) for h in HORIZONS}
+                for station_id, horizons in state["stations"].items()
+            },
+        }
+
+
+def format_skill_metrics(skills):
+    """Render `{region_id: get_skill(...)}` in the Prometheus text exposition format."""
+    lines = []
+    for metric in ("mae", "rmse", "bias"):
+        lines.append(f"# TYPE no2_forecast_{metric} gauge")
+        for region_id, skill in skills.items():
+            for horizon, summary in skill["overall"].items():
+                if summary[metric] is not None:
+                    lines.append(f'no2_forecast_{metric}{{region="{region_id}",horizon="{horizon}"}} {summary[metric]}')
+            for station_id, horizons in skill["stations"].items():
+                for horizon, summary in horizons.items():
+                    if summary[metric] is not None:
+                        lines.append(
+                            f'no2_forecast_{metric}{{region="{region_id}",station="{station_id}",horizon="{horizon}"}} {summary[metric]}'
+                        )
+
+    lines.append("# TYPE no2_forecast_samples_total counter")
+    for region_id, skill in skills.items():
+        for horizon, summary in skill["overall"].items():
+            lines.append(f'no2_forecast_samples_total{{region="{region_id}",horizon="{horizon}"}} {summary["n"]}')
+
+    return "\n".join(lines) + "\n"
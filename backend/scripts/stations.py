@@ -0,0 +1,343 @@
+import os
+import sys
+import json
+import time
+import datetime
+import threading
+
+import numpy as np
+import requests
+from scipy.spatial import cKDTree
+from pyproj import Transformer
+
+# Ensure the script can find config.py in the main directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config import Config
+from scripts.regions import REGIONS
+from scripts.kriging import GEOGRAPHIC_CRS
+
+# ✅ data/stations/<region>.json: every known NO₂ sensor plus its fetch health
+STATIONS_DIR = "data/stations"
+
+# ✅ Catalog sync from the OpenAQ locations endpoint, at most once per interval
+OPENAQ_LOCATIONS_URL = "https://api.openaq.org/v3/locations"
+NO2_PARAMETER_ID = 7  # ✅ "no2 ppm", as in data/no2_sensors.json
+LOCATIONS_PAGE_LIMIT = 1000
+SYNC_INTERVAL_HOURS = 24
+
+# ✅ Dead sensors: skipped once OpenAQ has had nothing from them for this long...
+DORMANT_AFTER_HOURS = 48
+# ✅ ...or backed off exponentially after repeated empty fetches
+BACKOFF_AFTER_FAILURES = 3
+BACKOFF_BASE_HOURS = 1
+MAX_BACKOFF_HOURS = 48
+
+# ✅ Stations this close share one set of weather calls
+WEATHER_CLUSTER_RADIUS_M = 2000
+
+_registries = {}  # region_id -> (mtime, registry)
+_indexes = {}  # region_id -> (live-station key, index)
+_lock = threading.RLock()  # ✅ Held across every read-modify-write of a cached registry
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _parse_time(value):
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+
+def _registry_path(region_id):
+    return os.path.join(STATIONS_DIR, f"{region_id}.json")
+
+
+def _new_entry(station):
+    """A registry entry: the `no2_sensors.json` station record plus its health."""
+    return {
+        "station_id": station["station_id"],
+        "station_name": station.get("station_name"),
+        "coordinates": station["coordinates"],
+        "no2_sensor": station["no2_sensor"],
+        "listed": True,  # ✅ False once the sensor disappears from the OpenAQ catalog
+        "last_seen_utc": station.get("last_seen_utc"),  # ✅ Latest data OpenAQ reported for the location
+        "last_value_utc": None,  # ✅ Last refresh that got a value from it
+        "failures": 0,  # ✅ Consecutive refreshes without a value
+        "next_attempt_utc": None,
+    }
+
+
+def load_registry(region_id):
+    """The region's registry, seeded from its static sensor list on first use."""
+    path = _registry_path(region_id)
+
+    with _lock:
+        if not os.path.exists(path):
+            with open(REGIONS[region_id]["sensors_file"], "r", encoding="utf-8") as f:
+                stations = json.load(f)
+            registry = {
+                "synced_at": None,
+                "sensors": {str(s["no2_sensor"]["sensor_id"]): _new_entry(s) for s in stations},
+            }
+            _write_registry(region_id, registry)
+
+        # ✅ Re-read only when another process (a refresh worker) has written it
+        mtime = os.path.getmtime(path)
+        cached = _registries.get(region_id)
+        if cached is None or cached[0] != mtime:
+            with open(path, "r", encoding="utf-8") as f:
+                _registries[region_id] = (mtime, json.load(f))
+        return _registries[region_id][1]
+
+
+def _write_registry(region_id, registry):
+    os.makedirs(STATIONS_DIR, exist_ok=True)
+    path = _registry_path(region_id)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(registry, f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)
+    _registries[region_id] = (os.path.getmtime(path), registry)
+
+
+def save_registry(region_id, registry):
+    with _lock:
+        _write_registry(region_id, registry)
+
+
+def fetch_locations(bbox):
+    """All OpenAQ locations measuring NO₂ inside `bbox` (min lon, min lat, max lon, max lat), or None on error."""
+    headers = {"X-API-Key": Config().api_key_openaq}
+    params = {
+        "bbox": ",".join(str(v) for v in bbox),
+        "parameters_id": NO2_PARAMETER_ID,
+        "limit": LOCATIONS_PAGE_LIMIT,
+        "page": 1,
+    }
+
+    locations = []
+    while True:
+        try:
+            response = requests.get(OPENAQ_LOCATIONS_URL, headers=headers, params=params)
+        except Exception as e:
+            print(f"❌ Error fetching OpenAQ locations: {e}")
+            return None
+        if response.status_code != 200:
+            print(f"❌ OpenAQ API Error: {response.status_code} - {response.text}")
+            return None
+
+        results = response.json().get("results", [])
+        locations.extend(results)
+        if len(results) < LOCATIONS_PAGE_LIMIT:
+            return locations
+        params["page"] += 1
+        time.sleep(1)  # Respect API rate limit
+
+
+def locations_to_stations(locations):
+    """One station record per NO₂ sensor, in the `no2_sensors.json` format."""
+    stations = []
+    for location in locations:
+        for sensor in location.get("sensors", []):
+            if sensor.get("parameter", {}).get("id") != NO2_PARAMETER_ID:
+                continue
+            stations.append({
+                "station_id": location["id"],
+                "station_name": location.get("name"),
+                "coordinates": {
+                    "latitude": location["coordinates"]["latitude"],
+                    "longitude": location["coordinates"]["longitude"],
+                },
+                "no2_sensor": {
+                    "sensor_id": sensor["id"],
+                    "name": sensor.get("name"),
+                    "parameter": sensor["parameter"],
+                },
+                "last_seen_utc": (location.get("datetimeLast") or {}).get("utc"),
+            })
+    return stations
+
+
+def sync_stations(region_id, fetch=fetch_locations, force=False):
+    """Merge the OpenAQ catalog for the region's bbox into the registry.
+
+    Returns a summary, or None when skipped (synced recently) or the catalog could not be fetched.
+    """
+    synced_at = _parse_time(load_registry(region_id)["synced_at"])
+    if not force and synced_at and _now() - synced_at < datetime.timedelta(hours=SYNC_INTERVAL_HOURS):
+        return None
+
+    locations = fetch(REGIONS[region_id]["bbox"])  # ✅ Network call outside the lock
+    if locations is None:
+        return None  # ✅ Keep serving the current registry
+
+    catalog = {str(s["no2_sensor"]["sensor_id"]): s for s in locations_to_stations(locations)}
+    with _lock:
+        summary = _merge_catalog(region_id, catalog)
+    print(f"✅ Station catalog synced for {REGIONS[region_id]['name']}: {summary}")
+    return summary
+
+
+def _merge_catalog(region_id, catalog):
+    registry = load_registry(region_id)
+    sensors = registry["sensors"]
+    summary = {"added": 0, "updated": 0, "delisted": 0}
+
+    for sensor_id, station in catalog.items():
+        entry = sensors.get(sensor_id)
+        if entry is None:
+            sensors[sensor_id] = _new_entry(station)
+            summary["added"] += 1
+            continue
+
+        changed = {
+            key: station[key] for key in ("station_id", "station_name", "coordinates", "no2_sensor", "last_seen_utc")
+            if entry.get(key) != station[key]
+        }
+        if changed or not entry["listed"]:
+            entry.update(changed, listed=True)
+            summary["updated"] += 1
+
+    for sensor_id, entry in sensors.items():
+        if entry["listed"] and sensor_id not in catalog:
+            entry["listed"] = False
+            summary["delisted"] += 1
+
+    registry["synced_at"] = _now().isoformat()
+    _write_registry(region_id, registry)
+    return summary
+
+
+def is_live(entry, now=None):
+    """Listed and reported by OpenAQ recently (or never reported on, as for seeded entries)."""
+    if not entry["listed"]:
+        return False
+    last_seen = _parse_time(entry["last_seen_utc"])
+    return last_seen is None or (now or _now()) - last_seen < datetime.timedelta(hours=DORMANT_AFTER_HOURS)
+
+
+def is_due(entry, now=None):
+    """Live and not backed off."""
+    now = now or _now()
+    next_attempt = _parse_time(entry["next_attempt_utc"])
+    return is_live(entry, now) and (next_attempt is None or now >= next_attempt)
+
+
+def list_stations(region_id, due_only=False, now=None):
+    """Station records of the live sensors (only those due for a fetch with `due_only`)."""
+    check = is_due if due_only else is_live
+    with _lock:
+        return [dict(entry) for entry in load_registry(region_id)["sensors"].values() if check(entry, now)]
+
+
+def record_fetch_results(region_id, results, now=None):
+    """Update freshness and failure counts from one refresh: `results` maps sensor_id -> got a value."""
+    now = now or _now()
+
+    with _lock:
+        registry = load_registry(region_id)
+        for sensor_id, ok in results.items():
+            entry = registry["sensors"].get(str(sensor_id))
+            if entry is None:
+                continue
+            if ok:
+                entry.update(last_value_utc=now.isoformat(), failures=0, next_attempt_utc=None)
+                continue
+
+            entry["failures"] += 1
+            if entry["failures"] >= BACKOFF_AFTER_FAILURES:
+                hours = min(BACKOFF_BASE_HOURS * 2 ** (entry["failures"] - BACKOFF_AFTER_FAILURES), MAX_BACKOFF_HOURS)
+                entry["next_attempt_utc"] = (now + datetime.timedelta(hours=hours)).isoformat()
+
+        _write_registry(region_id, registry)
+
+
+def station_index(region_id):
+    """KD-tree over the live stations in the region's projected CRS.
+
+    Rebuilt only when the set of live stations or their coordinates change, not on every
+    freshness update.
+    """
+    stations = list_stations(region_id)
+    key = tuple(
+        (s["no2_sensor"]["sensor_id"], s["coordinates"]["latitude"], s["coordinates"]["longitude"]) for s in stations
+    )
+    cached = _indexes.get(region_id)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    to_projected = Transformer.from_crs(GEOGRAPHIC_CRS, REGIONS[region_id]["crs"], always_xy=True)
+    x, y = to_projected.transform(
+        [s["coordinates"]["longitude"] for s in stations],
+        [s["coordinates"]["latitude"] for s in stations],
+    )
+    xy = np.column_stack([x, y]).reshape(-1, 2)
+
+    index = {
+        "stations": stations,
+        "sensor_ids": [str(s["no2_sensor"]["sensor_id"]) for s in stations],
+        "xy": xy,
+        "tree": cKDTree(xy) if len(xy) else None,
+        "to_projected": to_projected,
+    }
+    _indexes[region_id] = (key, index)
+    return index
+
+
+def nearest_stations(region_id, latitude, longitude, k=1):
+    """The `k` live stations nearest to a point, as (station, distance in metres) pairs."""
+    index = station_index(region_id)
+    if index["tree"] is None:
+        return []
+    point = index["to_projected"].transform(longitude, latitude)
+    distances, positions = index["tree"].query(point, k=min(k, len(index["stations"])))
+    return [(index["stations"][p], float(d)) for d, p in zip(np.atleast_1d(distances), np.atleast_1d(positions))]
+
+
+def stations_within(region_id, latitude, longitude, radius_m):
+    """Live stations within `radius_m` metres of a point."""
+    index = station_index(region_id)
+    if index["tree"] is None:
+        return []
+    point = index["to_projected"].transform(longitude, latitude)
+    return [index["stations"][p] for p in index["tree"].query_ball_point(point, radius_m)]
+
+
+def weather_clusters(region_id, stations, radius_m=WEATHER_CLUSTER_RADIUS_M):
+    """Map each station's sensor_id to the station whose weather it shares (greedy, within `radius_m`)."""
+    index = station_index(region_id)
+    wanted = {str(s["no2_sensor"]["sensor_id"]) for s in stations}
+    positions = {sensor_id: i for i, sensor_id in enumerate(index["sensor_ids"])}
+    leaders = {}
+
+    for station in stations:
+        sensor_id = str(station["no2_sensor"]["sensor_id"])
+        if sensor_id in leaders:
+            continue
+        leaders[sensor_id] = station
+        if sensor_id not in positions:
+            continue
+        for p in index["tree"].query_ball_point(index["xy"][positions[sensor_id]], radius_m):
+            neighbour = index["sensor_ids"][p]
+            if neighbour in wanted and neighbour not in leaders:
+                leaders[neighbour] = station
+
+    return leaders
+
+
+def station_status(region_id):
+    """Registry contents with per-sensor health, for the API."""
+    now = _now()
+    with _lock:
+        registry = load_registry(region_id)
+        synced_at = registry["synced_at"]
+        sensors = [
+            {**entry, "live": is_live(entry, now), "due": is_due(entry, now)}
+            for entry in registry["sensors"].values()
+        ]
+    return {
+        "synced_at": synced_at,
+        "total": len(sensors),
+        "live": sum(s["live"] for s in sensors),
+        "due": sum(s["due"] for s in sensors),
+        "sensors": sensors,
+    }
@@ -0,0 +1,176 @@
+import io
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import shapely
+from PIL import Image
+from pyproj import Transformer
+
+# ✅ XYZ raster tiles of the NO₂ field, rendered lazily and cached per snapshot version
+TILE_DIR = "data/tiles"
+TILE_SIZE = 256
+MEMORY_CACHE_TILES = 2048
+WEB_MERCATOR = "EPSG:3857"
+EARTH_HALF_CIRCUMFERENCE = 20037508.342789244
+
+# ✅ Fixed colour scale (ppm), same gradient as the Leaflet heatmap
+COLOR_VMIN = 0.0
+COLOR_VMAX = 0.04
+COLOR_STOPS = [
+    (0.0, (0, 0, 255)),
+    (0.3, (0, 255, 255)),
+    (0.5, (0, 255, 0)),
+    (0.7, (255, 255, 0)),
+    (1.0, (255, 0, 0)),
+]
+TILE_ALPHA = 170
+
+# ✅ 256-entry RGBA lookup table, built once
+_positions = np.linspace(0, 1, 256)
+COLOR_LUT = np.empty((256, 4), dtype=np.uint8)
+for _channel in range(3):
+    COLOR_LUT[:, _channel] = np.interp(_positions, [s for s, _ in COLOR_STOPS], [c[_channel] for _, c in COLOR_STOPS])
+COLOR_LUT[:, 3] = TILE_ALPHA
+
+_fields = {}  # region_id -> field state for the current snapshot
+_memory_cache = OrderedDict()  # (region_id, version, column, z, x, y) -> PNG bytes
+_lock = threading.Lock()
+
+
+def _encode_png(rgba):
+    buffer = io.BytesIO()
+    Image.fromarray(rgba).save(buffer, format="PNG", optimize=False)
+    return buffer.getvalue()
+
+
+EMPTY_TILE = _encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+
+
+def set_tile_field(region, version, grids):
+    """Use a new gridded snapshot (`interpolations_to_grid`) for tiles and drop older versions."""
+    field = {
+        "version": version,
+        "grids": grids,
+        "grid_x": region["grid"][0],
+        "grid_y": region["grid"][1],
+        "boundary": region["boundary"].geometry.union_all(),
+        "bounds": region["boundary"].total_bounds,
+        "to_region": Transformer.from_crs(WEB_MERCATOR, region["crs"], always_xy=True),
+    }
+    shapely.prepare(field["boundary"])
+
+    with _lock:
+        _fields[region["id"]] = field
+        for key in [k for k in _memory_cache if k[0] == region["id"] and k[1] != version]:
+            del _memory_cache[key]
+
+    # ✅ Old versions on disk are never served again
+    region_dir = os.path.join(TILE_DIR, region["id"])
+    if os.path.isdir(region_dir):
+        for old_version in os.listdir(region_dir):
+            if old_version != version:
+                shutil.rmtree(os.path.join(region_dir, old_version), ignore_errors=True)
+
+
+def get_tile_version(region_id):
+    with _lock:
+        field = _fields.get(region_id)
+    return field["version"] if field else None
+
+
+def _tile_pixel_centres(z, x, y):
+    """Web Mercator coordinates of every pixel centre in tile (z, x, y)."""
+    tile_span = 2 * EARTH_HALF_CIRCUMFERENCE / (2 ** z)
+    offsets = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    mx = -EARTH_HALF_CIRCUMFERENCE + (x + offsets) * tile_span
+    my = EARTH_HALF_CIRCUMFERENCE - (y + offsets) * tile_span
+    return np.meshgrid(mx, my)
+
+
+def _sample_bilinear(field, grid_x, grid_y, px, py):
+    """Bilinear sample of a regular grid, ignoring NaN neighbours."""
+    fx = (px - grid_x[0]) / (grid_x[1] - grid_x[0])
+    fy = (py - grid_y[0]) / (grid_y[1] - grid_y[0])
+    x0 = np.clip(np.floor(fx).astype(int), 0, len(grid_x) - 2)
+    y0 = np.clip(np.floor(fy).astype(int), 0, len(grid_y) - 2)
+    tx = np.clip(fx - x0, 0, 1)
+    ty = np.clip(fy - y0, 0, 1)
+
+    weighted, total = np.zeros(px.shape), np.zeros(px.shape)
+    for dy_, wy in ((0, 1 - ty), (1, ty)):
+        for dx_, wx in ((0, 1 - tx), (1, tx)):
+            values = field[y0 + dy_, x0 + dx_]
+            w = np.where(np.isnan(values), 0.0, wx * wy)
+            weighted += w * np.nan_to_num(values)
+            total += w
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, weighted / total, np.nan)
+
+
+def render_tile(field, column, z, x, y):
+    """Render one tile as PNG bytes with vectorized colour mapping."""
+    mx, my = _tile_pixel_centres(z, x, y)
+    px, py = field["to_region"].transform(mx, my)
+    px, py = np.asarray(px), np.asarray(py)
+
+    # ✅ Tiles that miss the region entirely are all transparent
+    minx, miny, maxx, maxy = field["bounds"]
+    if px.max() < minx or px.min() > maxx or py.max() < miny or py.min() > maxy:
+        return EMPTY_TILE
+
+    values = _sample_bilinear(field["grids"][column], field["grid_x"], field["grid_y"], px, py)
+    inside = shapely.contains_xy(field["boundary"], px, py) & ~np.isnan(values)
+    if not inside.any():
+        return EMPTY_TILE
+
+    scaled = (np.nan_to_num(values) - COLOR_VMIN) / (COLOR_VMAX - COLOR_VMIN)
+    rgba = COLOR_LUT[np.clip(scaled * 255, 0, 255).astype(np.uint8)]
+    rgba[~inside] = 0
+    return _encode_png(rgba)
+
+
+def get_tile(region_id, column, z, x, y):
+    """PNG bytes for a tile: memory LRU, then disk, then render. None if no snapshot yet."""
+    with _lock:
+        field = _fields.get(region_id)
+        if field is None:
+            return None, None
+        if column not in field["grids"]:
+            raise KeyError(column)
+
+        key = (region_id, field["version"], column, z, x, y)
+        if key in _memory_cache:
+            _memory_cache.move_to_end(key)
+            return _memory_cache[key], field["version"]
+
+    path = os.path.join(TILE_DIR, region_id, field["version"], column, str(z), str(x), f"{y}.png")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            png = f.read()
+    else:
+        png = render_tile(field, column, z, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(png)
+        os.replace(tmp_path, path)
+
+    with _lock:
+        _memory_cache[key] = png
+        while len(_memory_cache) > MEMORY_CACHE_TILES:
+            _memory_cache.popitem(last=False)
+
+    return png, field["version"]
+
+
+def color_scale():
+    """Colour scale used by the tiles, for drawing a matching legend."""
+    return {
+        "vmin": COLOR_VMIN,
+        "vmax": COLOR_VMAX,
+        "stops": [[position, "#%02x%02x%02x" % color] for position, color in COLOR_STOPS],
+    }
@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import datetime
+
+import pytest
+
+# Ensure the tests can find the scripts package in the backend directory
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scripts import stations
+
+REGION = "tokyo"
+NOW = datetime.datetime(2026, 10, 18, 12, tzinfo=datetime.timezone.utc)
+
+
+def _station(sensor_id, latitude, longitude, name=None):
+    """A record in the `no2_sensors.json` format."""
+    return {
+        "station_id": sensor_id * 10,
+        "station_name": name or f"station {sensor_id}",
+        "coordinates": {"latitude": latitude, "longitude": longitude},
+        "no2_sensor": {"sensor_id": sensor_id, "name": "no2 ppm", "parameter": {"id": stations.NO2_PARAMETER_ID}},
+    }
+
+
+def _location(station):
+    """The OpenAQ locations record the station comes from, plus a sensor for another parameter."""
+    return {
+        "id": station["station_id"],
+        "name": station["station_name"],
+        "coordinates": station["coordinates"],
+        "sensors": [
+            {"id": station["no2_sensor"]["sensor_id"], "name": "no2 ppm", "parameter": {"id": stations.NO2_PARAMETER_ID}},
+            {"id": station["no2_sensor"]["sensor_id"] + 1000, "name": "o3 ppm", "parameter": {"id": 10}},
+        ],
+        "datetimeLast": {"utc": NOW.isoformat()},
+    }
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """A fresh registry for REGION seeded with sensors 1 and 2, stored under `tmp_path`."""
+    sensors_file = tmp_path / "no2_sensors.json"
+    sensors_file.write_text(json.dumps([_station(1, 35.68, 139.76), _station(2, 35.60, 139.70)]))
+
+    monkeypatch.setattr(stations, "STATIONS_DIR", str(tmp_path / "stations"))
+    monkeypatch.setattr(stations, "_registries", {})
+    monkeypatch.setattr(stations, "_indexes", {})
+    monkeypatch.setattr(stations, "_now", lambda: NOW)
+    monkeypatch.setitem(stations.REGIONS[REGION], "sensors_file", str(sensors_file))
+    return stations.load_registry(REGION)
+
+
+def test_sync_merges_catalog(registry):
+    catalog = [
+        _location(_station(1, 35.68, 139.76, name="renamed")),  # ✅ Updated
+        _location(_station(3, 35.684, 139.76)),  # ✅ Added
+    ]  # ✅ Sensor 2 is gone from the catalog
+    requested = []
+
+    def fetch(bbox):
+        requested.append(bbox)
+        return catalog
+
+    summary = stations.sync_stations(REGION, fetch=fetch)
+
+    assert summary == {"added": 1, "updated": 1, "delisted": 1}
+    assert requested == [stations.REGIONS[REGION]["bbox"]]
+    assert {s["no2_sensor"]["sensor_id"] for s in stations.list_stations(REGION)} == {1, 3}
+    assert stations.load_registry(REGION)["sensors"]["1"]["station_name"] == "renamed"
+
+    # ✅ Synced recently: skipped without calling the API
+    assert stations.sync_stations(REGION, fetch=fetch) is None
+    assert len(requested) == 1
+
+
+def test_sync_keeps_registry_when_fetch_fails(registry):
+    assert stations.sync_stations(REGION, fetch=lambda bbox: None, force=True) is None
+    assert len(stations.list_stations(REGION)) == 2
+
+
+def test_backoff_after_repeated_failures(registry):
+    for _ in range(stations.BACKOFF_AFTER_FAILURES - 1):
+        stations.record_fetch_results(REGION, {1: False}, now=NOW)
+    assert {s["no2_sensor"]["sensor_id"] for s in stations.list_stations(REGION, due_only=True, now=NOW)} == {1, 2}
+
+    stations.record_fetch_results(REGION, {1: False}, now=NOW)
+    entry = stations.load_registry(REGION)["sensors"]["1"]
+    assert entry["failures"] == stations.BACKOFF_AFTER_FAILURES
+    assert not stations.is_due(entry, NOW)
+    assert stations.is_due(entry, NOW + datetime.timedelta(hours=stations.BACKOFF_BASE_HOURS))
+    assert [s["no2_sensor"]["sensor_id"] for s in stations.list_stations(REGION, due_only=True, now=NOW)] == [2]
+
+    # ✅ One value resets the backoff
+    stations.record_fetch_results(REGION, {1: True}, now=NOW)
+    entry = stations.load_registry(REGION)["sensors"]["1"]
+    assert entry["failures"] == 0
+    assert stations.is_due(entry, NOW)
+
+
+def test_weather_clusters(registry):
+    stations.sync_stations(REGION, fetch=lambda bbox: [
+        _location(_station(1, 35.68, 139.76)),
+        _location(_station(2, 35.60, 139.70)),
+        _location(_station(3, 35.684, 139.76)),  # ✅ ~450 m from sensor 1
+    ])
+    live = stations.list_stations(REGION)
+
+    leaders = stations.weather_clusters(REGION, live)
+
+    assert {sensor_id: leader["no2_sensor"]["sensor_id"] for sensor_id, leader in leaders.items()} == {
+        "1": 1, "2": 2, "3": 1,
+    }
+    assert [s["no2_sensor"]["sensor_id"] for s, _ in stations.nearest_stations(REGION, 35.683, 139.76)] == [3]
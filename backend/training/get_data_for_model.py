@@ -1,11 +1,17 @@
+import os
+import sys
 import requests
 import csv
 import datetime
 import time
 import pytz
-import json
 import random
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from config import Config
+from scripts.regions import DEFAULT_REGION
+from scripts.stations import load_registry
 
 # Constants for API rate limits
 MAX_CALLS_PER_MINUTE = 60
@@ -22,6 +28,12 @@ TARGET_TIMESTAMPS = 100
 # Timezone for Tokyo
 TOKYO_TZ = pytz.timezone("Asia/Tokyo")
 
+# Bulk backfill: one paged range query per station, weather in week-long windows
+HOURLY_HISTORY_FILE = "data/hourly_history.csv"
+HOURLY_FIELDS = ["station_id", "hour", "NO2", "temp", "wind", "wind_dir", "humidity", "pressure"]
+OPENAQ_PAGE_LIMIT = 1000
+WEATHER_WINDOW = datetime.timedelta(days=7)  # Max range of one OpenWeather history call
+
 
 def generate_random_timestamp(existing_timestamps):
     """Generate a unique timestamp between July 1, 2024, and February 28, 2025."""
@@ -123,10 +135,116 @@ def save_data_to_csv(record, filename="data/new_data_for_model.csv"):
         writer.writerow(record)
 
 
+def fetch_no2_history(sensor_id, start_utc, end_utc):
+    """Fetch every hourly NO₂ value of a sensor in [start, end) with one paged range query."""
+    url = f"https://api.openaq.org/v3/sensors/{sensor_id}/hours"
+    headers = {"X-API-Key": Config().api_key_openaq}
+    params = {
+        "datetime_from": start_utc.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "datetime_to": end_utc.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "limit": OPENAQ_PAGE_LIMIT,
+        "page": 1,
+    }
+
+    values = {}  # hour (UTC, end of the averaging period) -> value
+    while True:
+        try:
+            response = requests.get(url, headers=headers, params=params)
+            time.sleep(RATE_LIMIT_SLEEP)  # Respect API rate limit
+        except Exception as e:
+            print(f"❌ Error fetching NO₂ history: {e}")
+            break
+
+        if response.status_code != 200:
+            print(f"❌ OpenAQ API Error: {response.status_code} - {response.text}")
+            break
+
+        results = response.json().get("results", [])
+        for result in results:
+            hour = result.get("period", {}).get("datetimeTo", {}).get("utc")
+            if hour is not None:
+                values[hour[:13]] = result.get("value")
+
+        if len(results) < OPENAQ_PAGE_LIMIT:
+            break
+        params["page"] += 1
+
+    return values
+
+
+def fetch_weather_history(latitude, longitude, start_utc, end_utc):
+    """Fetch hourly weather in [start, end) as {unix hour: entry}, one call per week."""
+    url = "https://history.openweathermap.org/data/2.5/history/city"
+    weather = {}
+    window_start = start_utc
+    while window_start < end_utc:
+        window_end = min(window_start + WEATHER_WINDOW, end_utc)
+        params = {
+            "lat": latitude,
+            "lon": longitude,
+            "type": "hour",
+            "start": int(window_start.timestamp()),
+            "end": int(window_end.timestamp()),
+            "appid": Config().api_key_openweather,
+            "units": "metric"
+        }
+
+        try:
+            response = requests.get(url, params=params)
+            time.sleep(0.5)  # Avoid rate limit
+            if response.status_code == 200:
+                weather.update({hour["dt"]: hour for hour in response.json().get("list", [])})
+            else:
+                print(f"⚠️ OpenWeather API Error: {response.status_code} - {response.text}")
+        except Exception as e:
+            print(f"❌ Error fetching weather data: {e}")
+
+        window_start = window_end
+
+    return weather
+
+
+def backfill_history(start_utc, end_utc, filename=HOURLY_HISTORY_FILE):
+    """Store every hour of every station in [start, end) as long rows for `scripts.features`."""
+    sensors_data = list(load_registry(DEFAULT_REGION)["sensors"].values())  # ✅ Includes sensors that are dormant now
+
+    hours = []
+    hour = start_utc
+    while hour < end_utc:
+        hours.append(hour)
+        hour += datetime.timedelta(hours=1)
+
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=HOURLY_FIELDS)
+        writer.writeheader()
+
+        for station in sensors_data:
+            station_id = station["station_id"]
+            sensor_id = station["no2_sensor"]["sensor_id"]
+            latitude, longitude = station["coordinates"]["latitude"], station["coordinates"]["longitude"]
+
+            no2_values = fetch_no2_history(sensor_id, start_utc, end_utc)
+            weather_data = fetch_weather_history(latitude, longitude, start_utc, end_utc)
+
+            for hour in hours:
+                weather = weather_data.get(int(hour.timestamp()), {})
+                writer.writerow({
+                    "station_id": station_id,
+                    "hour": hour.strftime("%Y-%m-%d %H:%M:%S"),
+                    "NO2": no2_values.get(hour.strftime("%Y-%m-%dT%H")),
+                    "temp": weather.get("main", {}).get("temp"),
+                    "wind": weather.get("wind", {}).get("speed"),
+                    "wind_dir": weather.get("wind", {}).get("deg"),
+                    "humidity": weather.get("main", {}).get("humidity"),
+                    "pressure": weather.get("main", {}).get("pressure"),
+                })
+
+            print(f"📝 Stored {len(no2_values)} NO₂ hours and {len(weather_data)} weather hours for station {station_id}")
+
+
 def main():
     """Main function to fetch NO₂ and weather data for random timestamps."""
-    with open("data/no2_sensors.json", "r", encoding="utf-8") as file:
-        sensors_data = json.load(file)
+    sensors_data = list(load_registry(DEFAULT_REGION)["sensors"].values())  # ✅ Includes sensors that are dormant now
 
     collected_timestamps = set()
 
@@ -179,4 +297,19 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Collect NO₂ & weather training data.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("sample", help="Random single-hour samples (default)")
+
+    backfill_parser = subparsers.add_parser("backfill", help=f"Every hour of every station, into {HOURLY_HISTORY_FILE}")
+    backfill_parser.add_argument("--start", default=START_DATE.strftime("%Y-%m-%d"))
+    backfill_parser.add_argument("--end", default=END_DATE.strftime("%Y-%m-%d"))
+
+    args = parser.parse_args()
+    if args.command == "backfill":
+        start = datetime.datetime.strptime(args.start, "%Y-%m-%d").replace(tzinfo=pytz.UTC)
+        end = datetime.datetime.strptime(args.end, "%Y-%m-%d").replace(tzinfo=pytz.UTC)
+        backfill_history(start, end)
+    else:
+        main()
\ No newline at end of file
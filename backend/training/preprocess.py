@@ -1,19 +1,33 @@
 import pandas as pd
 from sklearn.preprocessing import RobustScaler
 import os
+import sys
 import joblib
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from scripts.features import build_features, samples_to_hourly, samples_to_live_order
+
 # Paths
 DATA_DIR = "data/"
 OUTPUT_DIR = "data/"
 
-# Load data
-train_df = pd.read_csv(os.path.join(DATA_DIR, "new_data_for_model.csv"))
-eval_df = pd.read_csv(os.path.join(DATA_DIR, "evaluation_data_for_model.csv"))
+HOURLY_HISTORY_FILE = "hourly_history.csv"  # ✅ Bulk per-station history from `get_data_for_model.py backfill`
+
+# Load hourly observations: bulk history if backfilled, else unroll the random-hour samples
+hourly_path = os.path.join(DATA_DIR, HOURLY_HISTORY_FILE)
+if os.path.exists(hourly_path):
+    hourly_df = pd.read_csv(hourly_path)
+else:
+    # Random-hour samples rarely overlap, so only a few hundred rows have all four NO₂ lags
+    print("⚠️ No hourly history found; run `python training/get_data_for_model.py backfill` for a full training set.")
+    hourly_df = samples_to_hourly(pd.read_csv(os.path.join(DATA_DIR, "new_data_for_model.csv")))
 
-# Rename NO2 measurement column
-train_df.rename(columns={"measurement_value": "NO2_t"}, inplace=True)
-eval_df.rename(columns={"measurement_value": "NO2_t"}, inplace=True)
+# ✅ Lags, weather & targets joined on (station_id, hour), so T+i really is the same station i hours later
+train_df = build_features(hourly_df)
+print(f"✅ {len(train_df)} training rows from {len(hourly_df)} hourly observations")
+
+# ✅ Evaluation samples come from the random-hour sampler: flip their lags to the live order
+eval_df = samples_to_live_order(pd.read_csv(os.path.join(DATA_DIR, "evaluation_data_for_model.csv")))
 
 # Define feature columns
 past_no2_cols = [f'NO2_lag_{i}' for i in range(1, 5)]
@@ -29,10 +43,6 @@ future_weather_cols = [f'future_wind_{i}' for i in range(1, 5)] + \
                       [f'future_humidity_{i}' for i in range(1, 5)] + \
                       [f'future_temp_{i}' for i in range(1, 5)]
 
-# Create future NO2 target columns in train data
-for i in range(1, 5):
-    train_df[f'NO2_target_T+{i}'] = train_df['NO2_t'].shift(-i)
-
 # Define input features
 input_features = ["NO2_t"] + past_no2_cols + past_weather_cols + future_weather_cols
 target_columns = [f'NO2_target_T+{i}' for i in range(1, 5)]  # Future NO₂ values
@@ -1,10 +1,14 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
 import keras
 from keras import layers
 import joblib
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from scripts.model_registry import register_model
+
 # Paths
 DATA_DIR = "data/"
 MODEL_DIR = "models/"
@@ -90,4 +94,7 @@ if not os.path.exists(MODEL_DIR):
 
 model.save(os.path.join(MODEL_DIR, "no2_forecast_model.keras"))  # Save in new format
 
-print("\n✅ Training complete. Model saved.")
\ No newline at end of file
+print("\n✅ Training complete. Model saved.")
+
+# Register as a new (inactive) version; activate it via POST /admin/models/{version}/activate
+register_model(os.path.join(MODEL_DIR, "no2_forecast_model.keras"), os.path.join(DATA_DIR, "scaler.pkl"))
\ No newline at end of file
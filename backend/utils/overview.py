@@ -1,48 +1,298 @@
+import os
+import sys
 import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import requests
 import geopandas as gpd
+import matplotlib
+matplotlib.use("Agg")  # ✅ Headless rendering in worker processes
 import matplotlib.pyplot as plt
-import contextily as ctx  # ✅ Add basemap for better visualization
+from matplotlib.colors import LinearSegmentedColormap
+from PIL import Image
+from pyproj import Transformer
+
+# ✅ Backend modules resolve `data/...` relative to backend/
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+sys.path.append(BACKEND_DIR)
+
+from scripts.regions import DEFAULT_REGION, load_region
+from scripts.history import list_snapshots, load_grid, parse_timestamp
+from scripts.kriging import KRIGING_COLUMNS, interpolations_to_grid
+from scripts.tiles import COLOR_VMIN, COLOR_VMAX, COLOR_STOPS, TILE_SIZE, WEB_MERCATOR, EARTH_HALF_CIRCUMFERENCE
+
+# ✅ OpenStreetMap tiles cached on disk as <zoom>/<x>/<y>.png; `prefetch` is the only step that needs network
+BASEMAP_CACHE_DIR = os.path.join(BACKEND_DIR, "data", "basemap")
+BASEMAP_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+BASEMAP_ZOOM = 12
+BASEMAP_ATTRIBUTION = "© OpenStreetMap contributors"
+USER_AGENT = "tokyo-no2-overview/1.0"
+MAP_PADDING = 0.03  # ✅ Fraction of the boundary extent shown around it
+
+# ✅ Outputs
+STATION_MAP_PATH = os.path.join(REPO_DIR, "frontend", "public", "no2_station_map.png")
+REPORT_DIR = os.path.join(BACKEND_DIR, "data", "reports")
+HEATMAP_ALPHA = 0.65
+
+# ✅ Same gradient as the map tiles and the Leaflet heatmap
+NO2_CMAP = LinearSegmentedColormap.from_list(
+    "no2", [(position, tuple(c / 255 for c in color)) for position, color in COLOR_STOPS]
+)
+
+_context = None  # ✅ Per-process render state: boundary, basemap, mesh and a reusable figure
+
+
+def tile_range(bounds, zoom):
+    """XYZ tile index ranges covering Web Mercator `bounds` (minx, miny, maxx, maxy)."""
+    n = 2 ** zoom
+    to_x = lambda mx: int(np.clip((mx + EARTH_HALF_CIRCUMFERENCE) / (2 * EARTH_HALF_CIRCUMFERENCE) * n, 0, n - 1))
+    to_y = lambda my: int(np.clip((EARTH_HALF_CIRCUMFERENCE - my) / (2 * EARTH_HALF_CIRCUMFERENCE) * n, 0, n - 1))
+    minx, miny, maxx, maxy = bounds
+    return range(to_x(minx), to_x(maxx) + 1), range(to_y(maxy), to_y(miny) + 1)
+
+
+def tile_path(zoom, x, y):
+    return os.path.join(BASEMAP_CACHE_DIR, str(zoom), str(x), f"{y}.png")
+
+
+def prefetch_basemap(bounds, zoom=BASEMAP_ZOOM):
+    """Download every missing tile covering `bounds` into the cache. Returns the number downloaded."""
+    xs, ys = tile_range(bounds, zoom)
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    downloaded = 0
+
+    for x in xs:
+        for y in ys:
+            path = tile_path(zoom, x, y)
+            if os.path.exists(path):
+                continue
+
+            try:
+                response = session.get(BASEMAP_URL.format(z=zoom, x=x, y=y), timeout=30)
+                time.sleep(0.1)  # ✅ Be gentle with the public tile servers
+            except Exception as e:
+                print(f"❌ Error fetching tile {zoom}/{x}/{y}: {e}")
+                continue
+            if response.status_code != 200:
+                print(f"⚠️ Tile {zoom}/{x}/{y}: {response.status_code}")
+                continue
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(response.content)
+            os.replace(path + ".tmp", path)
+            downloaded += 1
+
+    print(f"✅ Basemap zoom {zoom}: {downloaded} tiles downloaded, {len(xs) * len(ys)} cover the map.")
+    return downloaded
+
+
+def load_basemap(bounds, zoom=BASEMAP_ZOOM):
+    """Stitch cached tiles into (RGB image, extent). None if nothing is cached; never touches the network."""
+    xs, ys = tile_range(bounds, zoom)
+    image = np.full((len(ys) * TILE_SIZE, len(xs) * TILE_SIZE, 3), 255, dtype=np.uint8)
+    missing = 0
+
+    for i, y in enumerate(ys):
+        for j, x in enumerate(xs):
+            path = tile_path(zoom, x, y)
+            if not os.path.exists(path):
+                missing += 1
+                continue
+            with Image.open(path) as tile:
+                image[i * TILE_SIZE:(i + 1) * TILE_SIZE, j * TILE_SIZE:(j + 1) * TILE_SIZE] = np.asarray(tile.convert("RGB"))
+
+    if missing == len(xs) * len(ys):
+        print("⚠️ No cached basemap tiles; run `python backend/utils/overview.py prefetch` while online.")
+        return None
+    if missing:
+        print(f"⚠️ {missing} basemap tiles are not cached and will be blank.")
+
+    tile_meters = 2 * EARTH_HALF_CIRCUMFERENCE / 2 ** zoom
+    extent = (
+        xs[0] * tile_meters - EARTH_HALF_CIRCUMFERENCE,
+        (xs[-1] + 1) * tile_meters - EARTH_HALF_CIRCUMFERENCE,
+        EARTH_HALF_CIRCUMFERENCE - (ys[-1] + 1) * tile_meters,
+        EARTH_HALF_CIRCUMFERENCE - ys[0] * tile_meters,
+    )
+    return image, extent
+
+
+def build_context(region_id=DEFAULT_REGION, zoom=BASEMAP_ZOOM):
+    """Everything that is identical across frames: reprojected boundary & stations, mesh, basemap."""
+    region = load_region(region_id)
+    boundary = region["boundary"].to_crs(WEB_MERCATOR)
+
+    with open(region["sensors_file"], "r", encoding="utf-8") as f:
+        sensor_data = json.load(f)
+    stations = gpd.GeoDataFrame(
+        geometry=gpd.points_from_xy(
+            [s["coordinates"]["longitude"] for s in sensor_data],
+            [s["coordinates"]["latitude"] for s in sensor_data],
+        ),
+        crs="EPSG:4326",
+    ).to_crs(WEB_MERCATOR)
+
+    # ✅ Grid cell edges in Web Mercator, so the UTM grid keeps its true shape on the basemap
+    grid_x, grid_y, _ = region["grid"]
+    edges_x = np.concatenate([grid_x - (grid_x[1] - grid_x[0]) / 2, [grid_x[-1] + (grid_x[1] - grid_x[0]) / 2]])
+    edges_y = np.concatenate([grid_y - (grid_y[1] - grid_y[0]) / 2, [grid_y[-1] + (grid_y[1] - grid_y[0]) / 2]])
+    mesh_x, mesh_y = Transformer.from_crs(region["crs"], WEB_MERCATOR, always_xy=True).transform(*np.meshgrid(edges_x, edges_y))
+
+    minx, miny, maxx, maxy = boundary.total_bounds
+    pad = MAP_PADDING * max(maxx - minx, maxy - miny)
+    bounds = (minx - pad, miny - pad, maxx + pad, maxy + pad)
+
+    return {
+        "region": region,
+        "boundary": boundary,
+        "stations": stations,
+        "mesh": (mesh_x, mesh_y),
+        "bounds": bounds,
+        "basemap": load_basemap(bounds, zoom),
+        "heatmap": None,
+    }
+
+
+def new_map_axes(context):
+    """Figure with the cached basemap and ward boundaries, framed on the region."""
+    fig, ax = plt.subplots(figsize=(10, 8))
+    minx, miny, maxx, maxy = context["bounds"]
+
+    if context["basemap"] is not None:
+        image, extent = context["basemap"]
+        ax.imshow(image, extent=extent, interpolation="bilinear", zorder=0)
+        ax.text(0.99, 0.01, BASEMAP_ATTRIBUTION, transform=ax.transAxes, ha="right", va="bottom", fontsize=7)
+
+    context["boundary"].boundary.plot(ax=ax, color="black", linewidth=1, label="Tokyo Special Wards", zorder=3)
+    ax.set_xlim(minx, maxx)
+    ax.set_ylim(miny, maxy)
+    ax.set_xlabel("Longitude", fontsize=12)
+    ax.set_ylabel("Latitude", fontsize=12)
+    return fig, ax
+
+
+def render_station_map(context, output_path=STATION_MAP_PATH, dpi=600):
+    """The monitoring-station overview map."""
+    fig, ax = new_map_axes(context)
+
+    # ✅ Plot NO₂ monitoring stations with better visualization
+    context["stations"].plot(ax=ax, markersize=50, color="red", edgecolor="black", alpha=0.7, label="NO₂ Monitoring Stations", zorder=4)
+
+    ax.legend()
+    ax.set_title("NO₂ Monitoring Stations in Tokyo Special Wards", fontsize=14, fontweight="bold")
+
+    fig.savefig(output_path, dpi=dpi)
+    plt.close(fig)
+    print(f"✅ Station map saved to {output_path}")
+    return output_path
+
+
+def _heatmap_figure(context):
+    """Create the heatmap figure once per process; frames only swap the data and title."""
+    if context["heatmap"] is None:
+        fig, ax = new_map_axes(context)
+        mesh_x, mesh_y = context["mesh"]
+        empty = np.ma.masked_all((mesh_x.shape[0] - 1, mesh_x.shape[1] - 1))
+        mesh = ax.pcolormesh(mesh_x, mesh_y, empty, cmap=NO2_CMAP, vmin=COLOR_VMIN, vmax=COLOR_VMAX,
+                             alpha=HEATMAP_ALPHA, shading="flat", zorder=2)
+        context["stations"].plot(ax=ax, markersize=12, color="black", zorder=4)
+        fig.colorbar(mesh, ax=ax, label="NO₂ (ppm)", shrink=0.8)
+        title = ax.set_title("", fontsize=14, fontweight="bold")
+        context["heatmap"] = (fig, mesh, title)
+    return context["heatmap"]
+
+
+def render_snapshot(context, entry, columns, output_dir, dpi=150):
+    """Render every horizon in `columns` of one history snapshot. Returns the written paths."""
+    region = context["region"]
+    interpolations = load_grid(region["id"], entry)
+    if interpolations is None:
+        return []
+
+    grids = interpolations_to_grid({c: interpolations[c] for c in columns if c in interpolations}, region["grid"], region["crs"])
+    fig, mesh, title = _heatmap_figure(context)
+    stamp = entry["timestamp"].replace("-", "").replace(":", "")
+    paths = []
+
+    for column, field in grids.items():
+        mesh.set_array(np.ma.masked_invalid(field))
+        title.set_text(f"{region['name']} {column} · {entry['timestamp']}")
+        path = os.path.join(output_dir, f"{region['id']}_{stamp}_{column.replace('+', '')}.png")
+        fig.savefig(path, dpi=dpi)
+        paths.append(path)
+
+    return paths
+
+
+def _init_worker(region_id, zoom):
+    global _context
+    os.chdir(BACKEND_DIR)
+    _context = build_context(region_id, zoom)
+
+
+def _render_snapshot_task(args):
+    return render_snapshot(_context, *args)
 
-# ✅ File paths
-sensor_file = "backend/data/no2_sensors.json"
-boundary_file = "backend/data/tokyo_special_ward_topo.json"
 
-# ✅ Load NO₂ sensor data
-with open(sensor_file, "r", encoding="utf-8") as f:
-    sensor_data = json.load(f)
+def render_history(region_id=DEFAULT_REGION, start=None, end=None, columns=KRIGING_COLUMNS,
+                   output_dir=REPORT_DIR, n_jobs=None, zoom=BASEMAP_ZOOM, dpi=150):
+    """Render heatmaps of every stored snapshot in [start, end] across worker processes."""
+    entries = [e for e in list_snapshots(region_id, start, end) if e.get("grid_file")]
+    if not entries:
+        print("⚠️ No stored snapshots in that range.")
+        return []
 
-# ✅ Extract sensor locations
-sensor_lats = [station["coordinates"]["latitude"] for station in sensor_data]
-sensor_lons = [station["coordinates"]["longitude"] for station in sensor_data]
+    os.makedirs(output_dir, exist_ok=True)
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(entries))
+    tasks = [(entry, columns, output_dir, dpi) for entry in entries]
 
-# ✅ Load Tokyo special wards boundary
-tokyo_gdf = gpd.read_file(boundary_file)
-if tokyo_gdf.crs is None:
-    tokyo_gdf.set_crs(epsg=4326, inplace=True)
+    # ✅ Each worker builds its context once and reuses it for all of its frames
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(region_id, zoom)) as executor:
+        chunksize = max(1, len(tasks) // (n_jobs * 4))
+        paths = [path for snapshot_paths in executor.map(_render_snapshot_task, tasks, chunksize=chunksize)
+                 for path in snapshot_paths]
 
-# ✅ Convert CRS to Web Mercator (3857) for basemap support
-tokyo_gdf = tokyo_gdf.to_crs(epsg=3857)
+    print(f"✅ {len(paths)} heatmaps from {len(entries)} snapshots saved to {output_dir}")
+    return paths
 
-# ✅ Convert sensor locations to GeoDataFrame
-sensor_gdf = gpd.GeoDataFrame(geometry=gpd.points_from_xy(sensor_lons, sensor_lats), crs="EPSG:4326")
-sensor_gdf = sensor_gdf.to_crs(epsg=3857)  # Convert to Web Mercator
 
-# ✅ Create the figure
-fig, ax = plt.subplots(figsize=(10, 8))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render overview maps and heatmap reports.")
+    parser.add_argument("--region", default=DEFAULT_REGION)
+    parser.add_argument("--zoom", type=int, default=BASEMAP_ZOOM)
+    subparsers = parser.add_subparsers(dest="command")
 
-# ✅ Plot Tokyo special wards boundary
-tokyo_gdf.boundary.plot(ax=ax, color="black", linewidth=1, label="Tokyo Special Wards")
+    subparsers.add_parser("prefetch", help="Fill the basemap tile cache (needs network)")
 
-# ✅ Plot NO₂ monitoring stations with better visualization
-sensor_gdf.plot(ax=ax, markersize=50, color="red", edgecolor="black", alpha=0.7, label="NO₂ Monitoring Stations")
+    stations_parser = subparsers.add_parser("stations", help="Station overview map (default)")
+    stations_parser.add_argument("--output", default=STATION_MAP_PATH)
+    stations_parser.add_argument("--dpi", type=int, default=600)
 
-# ✅ Add a basemap for context
-ctx.add_basemap(ax, source=ctx.providers.OpenStreetMap.Mapnik)
+    heatmaps_parser = subparsers.add_parser("heatmaps", help="Heatmaps of stored snapshots")
+    heatmaps_parser.add_argument("--start", type=parse_timestamp)
+    heatmaps_parser.add_argument("--end", type=parse_timestamp)
+    heatmaps_parser.add_argument("--columns", nargs="+", default=KRIGING_COLUMNS)
+    heatmaps_parser.add_argument("--output-dir", default=REPORT_DIR)
+    heatmaps_parser.add_argument("--jobs", type=int)
+    heatmaps_parser.add_argument("--dpi", type=int, default=150)
 
-# ✅ Customize plot appearance
-ax.legend()
-ax.set_title("NO₂ Monitoring Stations in Tokyo Special Wards", fontsize=14, fontweight="bold")
-ax.set_xlabel("Longitude", fontsize=12)
-ax.set_ylabel("Latitude", fontsize=12)
+    args = parser.parse_args()
+    if args.command == "heatmaps":
+        args.output_dir = os.path.abspath(args.output_dir)
+    elif args.command in (None, "stations"):
+        args.output = os.path.abspath(getattr(args, "output", STATION_MAP_PATH))
+    os.chdir(BACKEND_DIR)
 
-plt.savefig("frontend/public/no2_station_map.png", dpi = 600)
\ No newline at end of file
+    if args.command == "prefetch":
+        context = build_context(args.region, args.zoom)
+        prefetch_basemap(context["bounds"], args.zoom)
+    elif args.command == "heatmaps":
+        render_history(args.region, args.start, args.end, args.columns, args.output_dir, args.jobs, args.zoom, args.dpi)
+    else:
+        render_station_map(build_context(args.region, args.zoom), args.output, getattr(args, "dpi", 600))
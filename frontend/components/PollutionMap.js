@@ -81,19 +81,12 @@ const PollutionMap = () => {
     const dataRef = useRef({});
     const [currentTimestamp, setCurrentTimestamp] = useState(""); // ✅ Show correct timestamp
 
-    const fetchLiveData = async () => {
+    // ✅ Shared by the initial fetch and pushed snapshots
+    const applyLiveData = async (data) => {
         try {
-            console.log("🔄 Fetching Live NO₂ Data...");
-            const response = await axios.get("http://localhost:8000/pollution/live");
-
-            if (response.data.status === "processing") {
-                console.warn("⚠ Data is still processing. Try again later.");
-                return;
-            }
-
             // ✅ Store fetched data for animation
-            dataRef.current = response.data;
-            const newTimestamps = Object.keys(response.data);
+            dataRef.current = data;
+            const newTimestamps = Object.keys(data);
             setTimestamps(newTimestamps);
 
             // ✅ Fetch formatted timestamps from backend
@@ -105,7 +98,7 @@ const PollutionMap = () => {
             // ✅ Find max pollution value for a consistent legend
             let maxPollution = 0;
             newTimestamps.forEach(ts => {
-                const values = response.data[ts].map(d => d[2]);
+                const values = data[ts].map(d => d[2]);
                 maxPollution = Math.max(maxPollution, ...values);
             });
 
@@ -114,17 +107,47 @@ const PollutionMap = () => {
             // ✅ Set initial pollution data
             if (newTimestamps.length > 0) {
                 setCurrentTimestamp(timestampsResponse.data.timestamps[0]);  // ✅ Show correct timestamp
-                setPollutionData(response.data[newTimestamps[0]] || []);
+                setPollutionData(data[newTimestamps[0]] || []);
             }
 
-            console.log("✅ Live Data Updated:", response.data);
+            console.log("✅ Live Data Updated:", data);
+        } catch (error) {
+            console.error("❌ Error applying live pollution data:", error.message);
+        }
+    };
+
+    const fetchLiveData = async () => {
+        try {
+            console.log("🔄 Fetching Live NO₂ Data...");
+            const response = await axios.get("http://localhost:8000/pollution/live");
+
+            if (response.data.status === "processing") {
+                console.warn("⚠ Data is still processing. Try again later.");
+                return;
+            }
+
+            await applyLiveData(response.data);
         } catch (error) {
             console.error("❌ Error fetching live pollution data:", error.message);
         }
     };
 
     useEffect(() => {
-        fetchLiveData();
+        // ✅ Fall back to a one-off fetch where Server-Sent Events are unavailable
+        if (typeof EventSource === "undefined") {
+            fetchLiveData();
+            return;
+        }
+
+        // ✅ Listen for new snapshots instead of polling / reloading (the current one is sent on connect)
+        const events = new EventSource(`http://localhost:8000/pollution/stream?payload=full`);
+        events.addEventListener("snapshot", (event) => {
+            const snapshot = JSON.parse(event.data);
+            console.log(`📡 New snapshot ${snapshot.version} pushed`);
+            applyLiveData(snapshot.data);
+        });
+
+        return () => events.close();
     }, []);
 
     const startAnimation = () => {
@@ -76,24 +76,11 @@ const PollutionRadar = () => {
         };
     }, []);
 
-    const fetchLiveData = async () => {
+    // ✅ Shared by the initial fetch and pushed snapshots
+    const applyLiveData = async (data) => {
         try {
-            console.log("🔄 API BASE URL:", JSON.stringify(API_BASE_URL));
-    
-            // ✅ Ensure response is assigned before using it
-            const response = await axios.get(`${API_BASE_URL}/pollution/live`);
-    
-            if (!response || !response.data) {
-                throw new Error("Invalid response from the API.");
-            }
-    
-            if (response.data.status === "processing") {
-                console.warn("⚠ Data is still processing. Try again later.");
-                return;
-            }
-    
-            dataRef.current = response.data;
-            const newTimestamps = Object.keys(response.data);
+            dataRef.current = data;
+            const newTimestamps = Object.keys(data);
             setTimestamps(newTimestamps);
     
             // ✅ Ensure timestamps are fetched correctly
@@ -104,7 +91,7 @@ const PollutionRadar = () => {
     
             let maxPollution = 0;
             newTimestamps.forEach(ts => {
-                const values = response.data[ts].map(d => d[2]);
+                const values = data[ts].map(d => d[2]);
                 maxPollution = Math.max(maxPollution, ...values);
             });
     
@@ -112,17 +99,53 @@ const PollutionRadar = () => {
     
             if (newTimestamps.length > 0) {
                 setCurrentTimestamp(timestampsResponse.data.timestamps[0]);
-                setPollutionData(response.data[newTimestamps[0]] || []);
+                setPollutionData(data[newTimestamps[0]] || []);
+            }
+    
+            console.log("✅ Live Data Updated:", data);
+        } catch (error) {
+            console.error("❌ Error applying live pollution data:", error.message);
+        }
+    };
+
+    const fetchLiveData = async () => {
+        try {
+            console.log("🔄 API BASE URL:", JSON.stringify(API_BASE_URL));
+    
+            // ✅ Ensure response is assigned before using it
+            const response = await axios.get(`${API_BASE_URL}/pollution/live`);
+    
+            if (!response || !response.data) {
+                throw new Error("Invalid response from the API.");
             }
     
-            console.log("✅ Live Data Updated:", response.data);
+            if (response.data.status === "processing") {
+                console.warn("⚠ Data is still processing. Try again later.");
+                return;
+            }
+    
+            await applyLiveData(response.data);
         } catch (error) {
             console.error("❌ Error fetching live pollution data:", error.message);
         }
     };    
 
     useEffect(() => {
-        fetchLiveData();
+        // ✅ Fall back to a one-off fetch where Server-Sent Events are unavailable
+        if (typeof EventSource === "undefined") {
+            fetchLiveData();
+            return;
+        }
+
+        // ✅ Listen for new snapshots instead of polling / reloading (the current one is sent on connect)
+        const events = new EventSource(`${API_BASE_URL}/pollution/stream?payload=full`);
+        events.addEventListener("snapshot", (event) => {
+            const snapshot = JSON.parse(event.data);
+            console.log(`📡 New snapshot ${snapshot.version} pushed`);
+            applyLiveData(snapshot.data);
+        });
+
+        return () => events.close();
     }, []);
 
     // ✅ Animation Logic